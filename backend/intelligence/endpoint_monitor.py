@@ -0,0 +1,241 @@
+"""Background health monitor for model endpoints (Ollama, Gemini).
+
+Keeps a cached availability flag and latency estimate per service so the
+router, /health and /metrics never probe on the request path.
+
+  ollama@<host>  One service per Ollama host. Active probe of GET /api/tags
+                 every ENDPOINT_PROBE_INTERVAL seconds; while down, probes back
+                 off exponentially (ENDPOINT_BACKOFF_BASE doubling up to
+                 ENDPOINT_BACKOFF_MAX). "ollama" means "any host".
+  gemini         No network probe — availability comes from the circuit
+                 breaker and daily quota; latency is learned from real calls
+                 via observe().
+
+Latency is an EWMA over probes and observed calls. State changes are logged,
+delivered to in-process subscribers, and published on ENDPOINT_EVENTS_CHANNEL.
+In-flight local calls can be raced against a "went down" signal with
+run_unless_down(), so the router fails over without waiting for the httpx
+timeout.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Awaitable, Callable, Optional, TypeVar
+
+import httpx
+
+if TYPE_CHECKING:
+    from intelligence.ollama_client import OllamaHost
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT_PROBE_INTERVAL = float(os.getenv("ENDPOINT_PROBE_INTERVAL", "15"))
+ENDPOINT_PROBE_TIMEOUT = 5.0
+ENDPOINT_BACKOFF_BASE = 2.0
+ENDPOINT_BACKOFF_MAX = 120.0
+LATENCY_EWMA_ALPHA = 0.2
+ENDPOINT_EVENTS_CHANNEL = "talos:endpoints:events"
+
+T = TypeVar("T")
+
+
+class ServiceDown(ConnectionError):
+    """Raised by run_unless_down() when the service went down mid-call."""
+
+
+# Request-path errors that mean the host itself is unreachable.
+CONNECTION_ERRORS = (httpx.ConnectError, httpx.RemoteProtocolError, ServiceDown)
+
+
+class _ServiceState:
+    def __init__(self) -> None:
+        self.available: Optional[bool] = None  # None until first probe
+        self.latency_ms: Optional[float] = None
+        self.last_probe: Optional[float] = None
+        self.last_change: Optional[float] = None
+        self.consecutive_failures = 0
+        self.next_probe_at = 0.0
+        self.down_event = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "available": self.available,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "last_probe": self.last_probe,
+            "last_change": self.last_change,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class EndpointMonitor:
+    def __init__(
+        self,
+        interval: float = ENDPOINT_PROBE_INTERVAL,
+        hosts: Optional[list["OllamaHost"]] = None,
+    ) -> None:
+        from intelligence.ollama_client import HOSTS
+        self._interval = interval
+        self._hosts = {f"ollama@{host.name}": host for host in (HOSTS if hosts is None else hosts)}
+        self._states = {name: _ServiceState() for name in [*self._hosts, "gemini"]}
+        self._subscribers: list[Callable[[str, bool], None]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Run one probe of everything, then keep probing in the background."""
+        await asyncio.gather(*(self._probe(name) for name in self._states))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.info("Endpoint monitor started: %s", {n: s.available for n, s in self._states.items()})
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    def subscribe(self, callback: Callable[[str, bool], None]) -> None:
+        self._subscribers.append(callback)
+
+    def is_available(self, name: str) -> bool:
+        """Cached availability. Unknown (not yet probed) counts as available."""
+        if name == "ollama":
+            return any(self.is_available(host) for host in self._hosts)
+        return self._states[name].available is not False
+
+    def latency_ms(self, name: str) -> Optional[float]:
+        if name == "ollama":
+            known = [self._states[h].latency_ms for h in self._hosts if self._states[h].available]
+            known = [v for v in known if v is not None]
+            return min(known) if known else None
+        return self._states[name].latency_ms
+
+    def snapshot(self) -> dict:
+        snap = {name: state.to_dict() for name, state in self._states.items()}
+        snap["ollama"] = {"available": self.is_available("ollama"), "latency_ms": self.latency_ms("ollama")}
+        return snap
+
+    def observe(self, name: str, latency_ms: float) -> None:
+        """Feed the latency estimate from a real request."""
+        self._update_latency(self._states[name], latency_ms)
+
+    def report_failure(self, name: str, exc: BaseException) -> None:
+        """Mark a service down on connection-level errors seen on the request path.
+
+        Timeouts are left to the prober: one slow generation says nothing
+        about the host, and marking it down would abort its other requests.
+        """
+        if isinstance(exc, CONNECTION_ERRORS):
+            self._set_available(name, False)
+
+    async def run_unless_down(self, name: str, coro: Awaitable[T]) -> T:
+        """Await coro, but abandon it with ServiceDown if the service goes down meanwhile.
+
+        The work is cancelled and awaited whenever it is abandoned, including
+        when the caller itself is cancelled, so its request does not run on.
+        """
+        state = self._states[name]
+        work = asyncio.ensure_future(coro)
+        down = asyncio.ensure_future(state.down_event.wait())
+        try:
+            await asyncio.wait({work, down}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            down.cancel()
+            abandoned = not work.done()
+            if abandoned:
+                work.cancel()
+                await asyncio.gather(work, return_exceptions=True)
+        if abandoned:
+            raise ServiceDown(f"{name} went down during request")
+        return work.result()
+
+    # ── Probing ──────────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            due = [n for n, s in self._states.items() if s.next_probe_at <= now]
+            if due:
+                await asyncio.gather(*(self._probe(n) for n in due))
+            wake = min(s.next_probe_at for s in self._states.values())
+            await asyncio.sleep(max(0.5, wake - time.monotonic()))
+
+    async def _probe(self, name: str) -> None:
+        state = self._states[name]
+        start = time.monotonic()
+        try:
+            ok = await (self._probe_gemini() if name == "gemini" else self._probe_ollama(name))
+        except Exception as exc:
+            logger.debug("Probe of %s failed: %s", name, exc)
+            ok = False
+        elapsed_ms = (time.monotonic() - start) * 1000
+        state.last_probe = time.time()
+
+        if ok:
+            state.consecutive_failures = 0
+            if name != "gemini":
+                self._update_latency(state, elapsed_ms)
+            state.next_probe_at = time.monotonic() + self._interval
+        else:
+            state.consecutive_failures += 1
+            backoff = min(
+                ENDPOINT_BACKOFF_BASE * 2 ** (state.consecutive_failures - 1),
+                ENDPOINT_BACKOFF_MAX,
+            )
+            state.next_probe_at = time.monotonic() + backoff
+        self._set_available(name, ok)
+
+    async def _probe_ollama(self, name: str) -> bool:
+        from intelligence.ollama_client import is_available
+        return await is_available(timeout=ENDPOINT_PROBE_TIMEOUT, host=self._hosts[name])
+
+    async def _probe_gemini(self) -> bool:
+        from intelligence.gemini_client import GEMINI_API_KEY, get_status, refresh_state
+        await refresh_state(force=True)
+        return bool(GEMINI_API_KEY) and bool(get_status().get("available"))
+
+    # ── State ────────────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _update_latency(state: _ServiceState, latency_ms: float) -> None:
+        if state.latency_ms is None:
+            state.latency_ms = latency_ms
+        else:
+            state.latency_ms += LATENCY_EWMA_ALPHA * (latency_ms - state.latency_ms)
+
+    def _set_available(self, name: str, available: bool) -> None:
+        state = self._states[name]
+        if state.available == available:
+            return
+        previous = state.available
+        state.available = available
+        state.last_change = time.time()
+        if available:
+            state.down_event = asyncio.Event()
+        else:
+            state.down_event.set()
+            # Re-probe soon so recovery is noticed quickly.
+            state.next_probe_at = min(state.next_probe_at, time.monotonic() + ENDPOINT_BACKOFF_BASE)
+
+        if previous is not None:
+            log = logger.info if available else logger.warning
+            log("Endpoint %s is now %s", name, "UP" if available else "DOWN")
+        for callback in self._subscribers:
+            try:
+                callback(name, available)
+            except Exception as exc:
+                logger.warning("Endpoint subscriber failed: %s", exc)
+        try:
+            asyncio.get_running_loop().create_task(self._publish(name, available))
+        except RuntimeError:
+            pass
+
+    @staticmethod
+    async def _publish(name: str, available: bool) -> None:
+        try:
+            from memory.redis_client import publish
+            await publish(ENDPOINT_EVENTS_CHANNEL, {"service": name, "available": available})
+        except Exception as exc:
+            logger.debug("Endpoint event publish failed: %s", exc)
+
+
+# Module-level singleton
+endpoint_monitor = EndpointMonitor()
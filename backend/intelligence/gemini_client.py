@@ -4,13 +4,22 @@ Spec § 2.4:
   Circuit breaker states: CLOSED → OPEN → HALF_OPEN
   60-minute cooldown on 429/safety blocks.
   Daily token limit: 50K soft limit.
+
+GenerativeModel objects are cached per (model, system_instruction, config)
+and called through the SDK's async API, so concurrent cloud calls do not
+occupy worker threads. generate_stream() is the streaming counterpart of
+generate(); both fall back to GEMINI_FALLBACK_MODEL on 429/quota errors.
+
+Breaker state and the daily token count live in Redis, so every uvicorn
+worker shares one budget and one breaker.
 """
 import asyncio
 import logging
 import os
 import time
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
 
 import google.generativeai as genai
 
@@ -21,7 +30,13 @@ GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 GEMINI_FALLBACK_MODEL = os.getenv("GEMINI_FALLBACK_MODEL", "gemini-3-flash")
 GEMINI_MAX_TOKENS = int(os.getenv("GEMINI_MAX_TOKENS", "8192"))
 GEMINI_MAX_TOKENS_PER_DAY = int(os.getenv("GEMINI_MAX_TOKENS_PER_DAY", "50000"))
+GEMINI_DEFAULT_TEMPERATURE = 0.7
+GEMINI_MODEL_CACHE_SIZE = 32  # distinct (model, system_instruction) pairs kept
 CIRCUIT_BREAKER_COOLDOWN = 3600.0  # 60 minutes
+GEMINI_STATE_CACHE_TTL = float(os.getenv("GEMINI_STATE_CACHE_TTL", "2"))  # local copy of shared state
+REDIS_BREAKER_KEY = "talos:gemini:breaker"
+REDIS_TOKENS_KEY_PREFIX = "talos:gemini:tokens:"  # + YYYY-MM-DD
+REDIS_TOKENS_TTL = 2 * 86400
 
 
 class CircuitState(Enum):
@@ -30,48 +45,146 @@ class CircuitState(Enum):
     HALF_OPEN = "half_open" # Testing if service recovered
 
 
+# Breaker transitions run as Lua scripts so concurrent workers cannot
+# interleave read-modify-write. open_since uses Redis server time.
+_BREAKER_FAILURE_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if failures >= tonumber(ARGV[1]) or state == 'half_open' then
+  state = 'open'
+  redis.call('HSET', KEYS[1], 'state', state, 'open_since', redis.call('TIME')[1])
+end
+return {state, failures, redis.call('HGET', KEYS[1], 'open_since') or '0'}
+"""
+_BREAKER_SUCCESS_SCRIPT = """
+local previous = redis.call('HGET', KEYS[1], 'state') or 'closed'
+redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', 0)
+return previous
+"""
+_BREAKER_HALF_OPEN_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local since = tonumber(redis.call('HGET', KEYS[1], 'open_since') or '0')
+if state == 'open' and tonumber(redis.call('TIME')[1]) - since >= tonumber(ARGV[1]) then
+  state = 'half_open'
+  redis.call('HSET', KEYS[1], 'state', state)
+end
+return state
+"""
+
+
 class GeminiCircuitBreaker:
-    """State machine: CLOSED → OPEN (on failure) → HALF_OPEN → CLOSED."""
+    """State machine: CLOSED → OPEN (on failure) → HALF_OPEN → CLOSED.
+
+    Shared by all workers through the REDIS_BREAKER_KEY hash. Reads use a
+    local copy refreshed by sync() at most every GEMINI_STATE_CACHE_TTL
+    seconds; transitions go straight to Redis. If Redis is unreachable the
+    breaker carries on with the local copy alone.
+    """
 
     def __init__(self) -> None:
         self._state = CircuitState.CLOSED
-        self._open_since: Optional[float] = None
+        self._open_since: Optional[float] = None  # wall-clock seconds
         self._failure_count = 0
         self._failure_threshold = 3
+        self._synced_at = 0.0
 
     @property
     def state(self) -> CircuitState:
-        if self._state == CircuitState.OPEN:
-            if time.monotonic() - (self._open_since or 0) >= CIRCUIT_BREAKER_COOLDOWN:
-                self._state = CircuitState.HALF_OPEN
-                logger.info("Gemini circuit breaker: OPEN → HALF_OPEN")
         return self._state
 
-    def record_success(self) -> None:
-        self._failure_count = 0
-        if self._state in (CircuitState.HALF_OPEN, CircuitState.OPEN):
-            self._state = CircuitState.CLOSED
-            logger.info("Gemini circuit breaker: → CLOSED")
-
-    def record_failure(self) -> None:
-        self._failure_count += 1
-        if self._failure_count >= self._failure_threshold or self._state == CircuitState.HALF_OPEN:
-            self._state = CircuitState.OPEN
-            self._open_since = time.monotonic()
+    @property
+    def settled(self) -> bool:
+        """CLOSED with no failures counted: a success has nothing to reset."""
+        return self._state == CircuitState.CLOSED and self._failure_count == 0
+
+    def _cooldown_elapsed(self) -> bool:
+        return time.time() - (self._open_since or 0) >= CIRCUIT_BREAKER_COOLDOWN
+
+    def _apply(self, state: str, failures: int, open_since: Optional[float]) -> None:
+        previous = self._state
+        self._state = CircuitState(state)
+        self._failure_count = failures
+        self._open_since = open_since
+        self._synced_at = time.monotonic()
+        if self._state == previous:
+            return
+        if self._state == CircuitState.OPEN:
             logger.warning(
-                "Gemini circuit breaker: → OPEN (cooldown %ds)", CIRCUIT_BREAKER_COOLDOWN
+                "Gemini circuit breaker: %s → OPEN (cooldown %ds)", previous.name, CIRCUIT_BREAKER_COOLDOWN
             )
+        else:
+            logger.info("Gemini circuit breaker: %s → %s", previous.name, self._state.name)
+
+    async def sync(self, force: bool = False) -> None:
+        """Refresh the local copy; moves OPEN → HALF_OPEN once the cooldown is over."""
+        if not force and time.monotonic() - self._synced_at < GEMINI_STATE_CACHE_TTL:
+            return
+        try:
+            from memory.redis_client import get_hash, run_script
+            raw = await get_hash(REDIS_BREAKER_KEY)
+            state = str(raw.get("state", CircuitState.CLOSED.value))
+            open_since = float(raw["open_since"]) if raw.get("open_since") else None
+            self._apply(state, int(raw.get("failures", 0)), open_since)
+            if self._state == CircuitState.OPEN and self._cooldown_elapsed():
+                state = await run_script(_BREAKER_HALF_OPEN_SCRIPT, [REDIS_BREAKER_KEY], [CIRCUIT_BREAKER_COOLDOWN])
+                self._apply(state, self._failure_count, self._open_since)
+        except Exception as exc:
+            logger.debug("Gemini breaker sync failed, using local state: %s", exc)
+            self._synced_at = time.monotonic()
+            if self._state == CircuitState.OPEN and self._cooldown_elapsed():
+                self._apply(CircuitState.HALF_OPEN.value, self._failure_count, self._open_since)
+
+    async def record_success(self) -> None:
+        try:
+            from memory.redis_client import run_script
+            await run_script(_BREAKER_SUCCESS_SCRIPT, [REDIS_BREAKER_KEY], [])
+        except Exception as exc:
+            logger.debug("Gemini breaker update failed, using local state: %s", exc)
+        self.closed()
+
+    async def queue_success(self, pipe: Any) -> None:
+        """Queue the success transition on a Redis pipeline; call closed() once it has run."""
+        from memory.redis_client import get_script
+        script = await get_script(_BREAKER_SUCCESS_SCRIPT)
+        await script(keys=[REDIS_BREAKER_KEY], args=[], client=pipe)
+
+    def closed(self) -> None:
+        self._apply(CircuitState.CLOSED.value, 0, self._open_since)
+
+    async def record_failure(self) -> None:
+        try:
+            from memory.redis_client import run_script
+            state, failures, open_since = await run_script(
+                _BREAKER_FAILURE_SCRIPT, [REDIS_BREAKER_KEY], [self._failure_threshold]
+            )
+            self._apply(state, int(failures), float(open_since) or None)
+        except Exception as exc:
+            logger.debug("Gemini breaker update failed, using local state: %s", exc)
+            failures = self._failure_count + 1
+            if failures >= self._failure_threshold or self._state == CircuitState.HALF_OPEN:
+                self._apply(CircuitState.OPEN.value, failures, time.time())
+            else:
+                self._apply(self._state.value, failures, self._open_since)
 
     def is_available(self) -> bool:
-        return self.state != CircuitState.OPEN
+        # An expired OPEN counts as available; the next sync() moves it to HALF_OPEN.
+        return self._state != CircuitState.OPEN or self._cooldown_elapsed()
 
 
 class TokenTracker:
-    """Daily token usage counter. Resets at midnight."""
+    """Daily token usage counter. Resets at midnight.
+
+    One Redis counter per day (REDIS_TOKENS_KEY_PREFIX + date) is shared by
+    all workers and incremented atomically. Reads use a local copy refreshed
+    at most every GEMINI_STATE_CACHE_TTL seconds. Usage recorded while Redis
+    is unreachable is added to the counter on the next successful write.
+    """
 
     def __init__(self) -> None:
         self._day_start = self._today()
         self._used = 0
+        self._unsynced = 0
+        self._synced_at = 0.0
 
     @staticmethod
     def _today() -> str:
@@ -82,10 +195,54 @@ class TokenTracker:
         if self._today() != self._day_start:
             self._day_start = self._today()
             self._used = 0
+            self._unsynced = 0
+            self._synced_at = 0.0
 
-    def add(self, tokens: int) -> None:
+    @property
+    def _key(self) -> str:
+        return REDIS_TOKENS_KEY_PREFIX + self._day_start
+
+    async def _incr(self, tokens: int, also: Optional[Callable[[Any], Awaitable[None]]] = None) -> None:
+        from memory.redis_client import get_client
+        r = await get_client()
+        async with r.pipeline(transaction=True) as pipe:
+            if tokens:
+                pipe.incrby(self._key, tokens)
+                pipe.expire(self._key, REDIS_TOKENS_TTL)
+            if also is not None:
+                await also(pipe)
+            results = await pipe.execute()
+        if tokens:
+            self._used = int(results[0])
+            self._unsynced = 0
+            self._synced_at = time.monotonic()
+
+    async def add(self, tokens: int, also: Optional[Callable[[Any], Awaitable[None]]] = None) -> None:
+        """Count `tokens`. `also` queues further commands on the same Redis pipeline."""
+        self._maybe_reset()
+        tokens = max(tokens, 0)
+        if not tokens and also is None:
+            return
+        try:
+            await self._incr(tokens + self._unsynced if tokens else 0, also)
+        except Exception as exc:
+            logger.debug("Gemini token counter update failed, counting locally: %s", exc)
+            self._unsynced += tokens
+            self._used += tokens
+
+    async def sync(self, force: bool = False) -> None:
         self._maybe_reset()
-        self._used += tokens
+        if not force and time.monotonic() - self._synced_at < GEMINI_STATE_CACHE_TTL:
+            return
+        try:
+            if self._unsynced:
+                await self._incr(self._unsynced)
+                return
+            from memory.redis_client import get_value
+            self._used = int(await get_value(self._key) or 0)
+        except Exception as exc:
+            logger.debug("Gemini token counter sync failed, using local count: %s", exc)
+        self._synced_at = time.monotonic()
 
     @property
     def used(self) -> int:
@@ -101,45 +258,48 @@ class TokenTracker:
 
 _circuit_breaker = GeminiCircuitBreaker()
 _token_tracker = TokenTracker()
-_primary_model = None
-_fallback_model = None
+_configured = False
+_models: "OrderedDict[tuple, genai.GenerativeModel]" = OrderedDict()
 _last_used_model = GEMINI_MODEL
 
 
-def _get_model(use_fallback: bool = False):
-    global _primary_model, _fallback_model
-    
+def _get_model(model_name: str, system_instruction: Optional[str] = None) -> "genai.GenerativeModel":
+    """Cached GenerativeModel per (model, system_instruction, generation config)."""
+    global _configured
+
     if not GEMINI_API_KEY:
         raise RuntimeError("GEMINI_API_KEY is not set")
-        
-    genai.configure(api_key=GEMINI_API_KEY)
-    
-    if use_fallback:
-        if _fallback_model is None:
-            _fallback_model = genai.GenerativeModel(
-                model_name=GEMINI_FALLBACK_MODEL,
-                generation_config=genai.GenerationConfig(
-                    max_output_tokens=GEMINI_MAX_TOKENS,
-                    temperature=0.7,
-                ),
-            )
-        return _fallback_model
-    else:
-        if _primary_model is None:
-            _primary_model = genai.GenerativeModel(
-                model_name=GEMINI_MODEL,
-                generation_config=genai.GenerationConfig(
-                    max_output_tokens=GEMINI_MAX_TOKENS,
-                    temperature=0.7,
-                ),
-            )
-        return _primary_model
-
-
-async def generate(
-    prompt: str,
-    system_instruction: Optional[str] = None,
-) -> str:
+    if not _configured:
+        genai.configure(api_key=GEMINI_API_KEY)
+        _configured = True
+
+    key = (model_name, system_instruction or "", GEMINI_MAX_TOKENS, GEMINI_DEFAULT_TEMPERATURE)
+    model = _models.get(key)
+    if model is not None:
+        _models.move_to_end(key)
+        return model
+
+    model = genai.GenerativeModel(
+        model_name=model_name,
+        system_instruction=system_instruction or None,
+        generation_config=genai.GenerationConfig(
+            max_output_tokens=GEMINI_MAX_TOKENS,
+            temperature=GEMINI_DEFAULT_TEMPERATURE,
+        ),
+    )
+    _models[key] = model
+    while len(_models) > GEMINI_MODEL_CACHE_SIZE:
+        _models.popitem(last=False)
+    return model
+
+
+async def refresh_state(force: bool = False) -> None:
+    """Pull shared breaker/quota state from Redis (cached for GEMINI_STATE_CACHE_TTL)."""
+    await asyncio.gather(_circuit_breaker.sync(force), _token_tracker.sync(force))
+
+
+async def _check_available() -> None:
+    await refresh_state()
     if not _circuit_breaker.is_available():
         raise RuntimeError(
             f"Gemini circuit breaker is OPEN — retry in "
@@ -150,62 +310,133 @@ async def generate(
             f"Gemini daily token limit reached ({GEMINI_MAX_TOKENS_PER_DAY} tokens/day)"
         )
 
+
+def _is_rate_limited(exc: Exception) -> bool:
+    err_str = str(exc)
+    return "429" in err_str or "RESOURCE_EXHAUSTED" in err_str or "quota" in err_str.lower()
+
+
+async def _record_success(model_name: str, response) -> None:
+    """Count the tokens and close the breaker in one Redis round trip.
+
+    The breaker is only written when the local copy is not already CLOSED
+    with no failures, which is the common case.
+    """
     global _last_used_model
+    _last_used_model = model_name
+    usage = getattr(response, "usage_metadata", None)
+    tokens = (usage.total_token_count or 0) if usage else 0
+    if _circuit_breaker.settled:
+        await _token_tracker.add(tokens)
+        return
+    await _token_tracker.add(tokens, also=_circuit_breaker.queue_success)
+    _circuit_breaker.closed()
+
+
+async def record_abandoned(tokens: int) -> None:
+    """Count tokens for a call cancelled before Gemini reported its usage (a losing hedge)."""
+    await _token_tracker.add(tokens)
+
+
+async def _record_failure(exc: Exception) -> None:
+    err_str = str(exc).upper()
+    if "SAFETY" in err_str or "BLOCKED" in err_str:
+        logger.warning("Gemini safety block — tripping circuit breaker")
+    await _circuit_breaker.record_failure()
+
+
+async def _generate_once(
+    model_name: str,
+    prompt: str,
+    system_instruction: Optional[str],
+    overrides: Optional[dict],
+) -> str:
+    model = _get_model(model_name, system_instruction)
+    response = await model.generate_content_async(prompt, generation_config=overrides)
+    text = response.text
+    await _record_success(model_name, response)
+    logger.debug("Gemini response (%s): %d chars, tokens_used=%d", model_name, len(text), _token_tracker.used)
+    return text
+
+
+async def _stream_once(
+    model_name: str,
+    prompt: str,
+    system_instruction: Optional[str],
+    overrides: Optional[dict],
+) -> AsyncIterator[str]:
+    model = _get_model(model_name, system_instruction)
+    response = await model.generate_content_async(prompt, generation_config=overrides, stream=True)
+    emitted = False
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            continue  # chunk without text parts (e.g. the final usage/finish chunk)
+        if text:
+            emitted = True
+            yield text
+    if not emitted:
+        response.text  # raises with the block/finish reason when nothing was generated
+    await _record_success(model_name, response)
+    logger.debug("Gemini stream finished (%s): tokens_used=%d", model_name, _token_tracker.used)
+
+
+async def generate(
+    prompt: str,
+    system_instruction: Optional[str] = None,
+    temperature: Optional[float] = None,
+) -> str:
+    await _check_available()
+    overrides = {"temperature": temperature} if temperature is not None else None
+
     try:
-        model = _get_model(use_fallback=False)
+        return await _generate_once(GEMINI_MODEL, prompt, system_instruction, overrides)
+    except Exception as exc:
+        if not _is_rate_limited(exc):
+            await _record_failure(exc)
+            raise
+        logger.warning("Primary model (%s) rate limited/exhausted. Attempting fallback (%s).", GEMINI_MODEL, GEMINI_FALLBACK_MODEL)
 
-        if system_instruction:
-            model = genai.GenerativeModel(
-                model_name=GEMINI_MODEL,
-                system_instruction=system_instruction,
-                generation_config=genai.GenerationConfig(max_output_tokens=GEMINI_MAX_TOKENS),
-            )
+    try:
+        return await _generate_once(GEMINI_FALLBACK_MODEL, prompt, system_instruction, overrides)
+    except Exception as fallback_exc:
+        logger.error("Fallback model (%s) also failed: %s", GEMINI_FALLBACK_MODEL, fallback_exc)
+        await _circuit_breaker.record_failure()
+        raise
 
-        response = await asyncio.to_thread(model.generate_content, prompt)
-        text = response.text
-        _last_used_model = GEMINI_MODEL
 
-        usage = getattr(response, "usage_metadata", None)
-        if usage:
-            _token_tracker.add(usage.total_token_count or 0)
+async def generate_stream(
+    prompt: str,
+    system_instruction: Optional[str] = None,
+    temperature: Optional[float] = None,
+) -> AsyncIterator[str]:
+    """Stream a response chunk by chunk.
 
-        _circuit_breaker.record_success()
-        logger.debug("Gemini response (%s): %d chars, tokens_used=%d", _last_used_model, len(text), _token_tracker.used)
-        return text
+    A 429 on the primary model switches to the fallback model, as in
+    generate(), as long as nothing has been yielded yet.
+    """
+    await _check_available()
+    overrides = {"temperature": temperature} if temperature is not None else None
 
+    emitted = False
+    try:
+        async for text in _stream_once(GEMINI_MODEL, prompt, system_instruction, overrides):
+            emitted = True
+            yield text
+        return
     except Exception as exc:
-        err_str = str(exc)
-        if "429" in err_str or "RESOURCE_EXHAUSTED" in err_str or "quota" in err_str.lower():
-            logger.warning("Primary model (%s) rate limited/exhausted. Attempting fallback (%s).", GEMINI_MODEL, GEMINI_FALLBACK_MODEL)
-            try:
-                fallback = _get_model(use_fallback=True)
-                if system_instruction:
-                    fallback = genai.GenerativeModel(
-                        model_name=GEMINI_FALLBACK_MODEL,
-                        system_instruction=system_instruction,
-                        generation_config=genai.GenerationConfig(max_output_tokens=GEMINI_MAX_TOKENS),
-                    )
-                fallback_response = await asyncio.to_thread(fallback.generate_content, prompt)
-                text = fallback_response.text
-                _last_used_model = GEMINI_FALLBACK_MODEL
-                
-                usage = getattr(fallback_response, "usage_metadata", None)
-                if usage:
-                    _token_tracker.add(usage.total_token_count or 0)
-
-                _circuit_breaker.record_success()
-                logger.debug("Gemini fallback response (%s): %d chars, tokens_used=%d", _last_used_model, len(text), _token_tracker.used)
-                return text
-                
-            except Exception as fallback_exc:
-                logger.error("Fallback model (%s) also failed: %s", GEMINI_FALLBACK_MODEL, fallback_exc)
-                _circuit_breaker.record_failure()
-                raise fallback_exc
-        elif "SAFETY" in err_str.upper() or "BLOCKED" in err_str.upper():
-            logger.warning("Gemini safety block — tripping circuit breaker")
-            _circuit_breaker.record_failure()
-        else:
-            _circuit_breaker.record_failure()
+        if emitted or not _is_rate_limited(exc):
+            await _record_failure(exc)
+            raise
+        logger.warning("Primary model (%s) rate limited/exhausted. Attempting fallback (%s).", GEMINI_MODEL, GEMINI_FALLBACK_MODEL)
+
+    try:
+        async for text in _stream_once(GEMINI_FALLBACK_MODEL, prompt, system_instruction, overrides):
+            yield text
+    except Exception as fallback_exc:
+        logger.error("Fallback model (%s) also failed: %s", GEMINI_FALLBACK_MODEL, fallback_exc)
+        await _circuit_breaker.record_failure()
         raise
 
 
@@ -0,0 +1,214 @@
+"""GPU telemetry sampler — VRAM, utilisation and temperature time series.
+
+A background task reads the GPU every GPU_TELEMETRY_INTERVAL seconds and
+keeps the last GPU_TELEMETRY_HISTORY samples in a ring buffer. Readers
+(VRAMMutex, /metrics, maintenance.health) only look at the buffer, so nothing
+on the request path waits for the driver.
+
+The source is chosen with GPU_TELEMETRY_SOURCE:
+  auto        nvidia-smi if it is on PATH, otherwise telemetry is off
+  nvidia-smi  `nvidia-smi --query-gpu` run as an async subprocess
+  simulated   synthetic readings derived from the VRAM mutex (CPU-only hosts, tests)
+  none        off
+Extra sources can be added with register_source().
+"""
+import abc
+import asyncio
+import logging
+import os
+import random
+import shutil
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Callable, Optional
+
+from intelligence.vram_mutex import VRAMTimeoutConfig
+
+logger = logging.getLogger(__name__)
+
+GPU_TELEMETRY_SOURCE = os.getenv("GPU_TELEMETRY_SOURCE", "auto")
+GPU_TELEMETRY_INTERVAL = float(os.getenv("GPU_TELEMETRY_INTERVAL", "5"))
+GPU_TELEMETRY_HISTORY = int(os.getenv("GPU_TELEMETRY_HISTORY", "720"))  # 1h at 5s
+GPU_TELEMETRY_DEVICE = os.getenv("GPU_TELEMETRY_DEVICE", "0")
+
+
+@dataclass
+class GPUSample:
+    ts: float
+    vram_used_mb: Optional[float]
+    vram_total_mb: Optional[float]
+    utilization_pct: Optional[float]
+    temperature_c: Optional[float]
+
+
+class GPUSource(abc.ABC):
+    """A device to sample. read() must not block the event loop."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    async def read(self) -> GPUSample:
+        ...
+
+
+class NvidiaSmiSource(GPUSource):
+    name = "nvidia-smi"
+    _FIELDS = "memory.used,memory.total,utilization.gpu,temperature.gpu"
+
+    def __init__(self, device: str = GPU_TELEMETRY_DEVICE) -> None:
+        self._device = device
+
+    @staticmethod
+    def _number(raw: str) -> Optional[float]:
+        try:
+            return float(raw.strip())
+        except ValueError:
+            return None  # "[N/A]" on some boards
+
+    async def read(self) -> GPUSample:
+        proc = await asyncio.create_subprocess_exec(
+            "nvidia-smi", f"--query-gpu={self._FIELDS}", "--format=csv,noheader,nounits",
+            "-i", self._device,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                proc.communicate(), timeout=VRAMTimeoutConfig.NVIDIA_SMI_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError(f"nvidia-smi exited {proc.returncode}: {stderr.decode().strip()}")
+        used, total, util, temp = (self._number(v) for v in stdout.decode().splitlines()[0].split(","))
+        return GPUSample(time.time(), used, total, util, temp)
+
+
+class SimulatedSource(GPUSource):
+    """Plausible readings that follow the VRAM mutex: footprint of the loaded model, load from holders."""
+
+    name = "simulated"
+    MODEL_FOOTPRINT_MB = {"coder": 5200.0, "vl": 6400.0}
+
+    def __init__(self, total_mb: float = 12288.0, idle_mb: float = 350.0) -> None:
+        self._total_mb = total_mb
+        self._idle_mb = idle_mb
+        self._temperature = 40.0
+
+    async def read(self) -> GPUSample:
+        from intelligence.vram_mutex import VRAM_MAX_CONCURRENT, vram_mutex
+        used = self._idle_mb + self.MODEL_FOOTPRINT_MB.get(vram_mutex.loaded_model or "", 0.0)
+        util = min(100.0, 100.0 * vram_mutex.load / VRAM_MAX_CONCURRENT) if vram_mutex.load else 0.0
+        self._temperature += 0.1 * ((40.0 + util * 0.4) - self._temperature)
+        return GPUSample(
+            time.time(),
+            round(used + random.uniform(-20, 20), 1),
+            self._total_mb,
+            round(util, 1),
+            round(self._temperature, 1),
+        )
+
+
+SOURCES: dict[str, Callable[[], GPUSource]] = {
+    NvidiaSmiSource.name: NvidiaSmiSource,
+    SimulatedSource.name: SimulatedSource,
+}
+
+
+def register_source(name: str, factory: Callable[[], GPUSource]) -> None:
+    SOURCES[name] = factory
+
+
+def _make_source(name: str) -> Optional[GPUSource]:
+    if name == "auto":
+        name = NvidiaSmiSource.name if shutil.which("nvidia-smi") else "none"
+    if name == "none":
+        return None
+    if name not in SOURCES:
+        logger.warning("Unknown GPU_TELEMETRY_SOURCE %r — telemetry disabled", name)
+        return None
+    return SOURCES[name]()
+
+
+class GPUTelemetry:
+    def __init__(
+        self,
+        source: str = GPU_TELEMETRY_SOURCE,
+        interval: float = GPU_TELEMETRY_INTERVAL,
+        history: int = GPU_TELEMETRY_HISTORY,
+    ) -> None:
+        self._source_name = source
+        self._source: Optional[GPUSource] = None
+        self._interval = interval
+        self._samples: deque[GPUSample] = deque(maxlen=history)
+        self._task: Optional[asyncio.Task] = None
+        self.errors = 0
+
+    def start(self, source: Optional[GPUSource] = None) -> None:
+        """Begin sampling. Pass a source to override GPU_TELEMETRY_SOURCE (e.g. in tests)."""
+        self._source = source or _make_source(self._source_name)
+        if self._source is None:
+            logger.info("GPU telemetry disabled (source=%s)", self._source_name)
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        logger.info("GPU telemetry started (source=%s, every %.0fs)", self._source.name, self._interval)
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def sample(self) -> Optional[GPUSample]:
+        """Take one reading now and append it to the series."""
+        if self._source is None:
+            return None
+        try:
+            reading = await self._source.read()
+        except Exception as exc:
+            self.errors += 1
+            logger.debug("GPU telemetry read failed: %s", exc)
+            return None
+        self._samples.append(reading)
+        return reading
+
+    async def _run(self) -> None:
+        while True:
+            await self.sample()
+            await asyncio.sleep(self._interval)
+
+    def latest(self) -> Optional[GPUSample]:
+        return self._samples[-1] if self._samples else None
+
+    def series(self, seconds: Optional[float] = None) -> list[GPUSample]:
+        if seconds is None:
+            return list(self._samples)
+        cutoff = time.time() - seconds
+        return [s for s in self._samples if s.ts >= cutoff]
+
+    def stats(self, window: float = 300.0) -> dict:
+        latest = self.latest()
+        recent = self.series(window)
+
+        def _summary(field: str) -> Optional[dict]:
+            values = [getattr(s, field) for s in recent if getattr(s, field) is not None]
+            if not values:
+                return None
+            return {"min": min(values), "max": max(values), "avg": round(sum(values) / len(values), 1)}
+
+        return {
+            "source": self._source.name if self._source else None,
+            "samples": len(self._samples),
+            "errors": self.errors,
+            "latest": asdict(latest) if latest else None,
+            f"last_{int(window)}s": {
+                f: _summary(f) for f in ("vram_used_mb", "utilization_pct", "temperature_c")
+            },
+        }
+
+
+# Module-level singleton
+gpu_telemetry = GPUTelemetry()
@@ -0,0 +1,261 @@
+"""Hedged local/cloud requests.
+
+Opt-in (HEDGE_ENABLED). A coder request starts locally as usual. If the
+local call has not answered (route) or produced its first token
+(route_stream) within the hedge delay, a Gemini request starts in parallel.
+Whichever answers first wins, and the loser is cancelled and awaited before
+the winner's answer is returned. Cancelling the local leg releases its VRAM
+slot and closes the HTTP request, so Ollama stops generating.
+
+The hedge delay is the recent p95 of the matching tracer stage
+("generate.local" for whole responses, "generate.local.first_token" for
+streams) x HEDGE_P95_FACTOR, clamped to [HEDGE_MIN_DELAY_MS,
+HEDGE_MAX_DELAY_MS]. Until HEDGE_MIN_SAMPLES have been seen,
+HEDGE_DEFAULT_DELAY_MS is used instead. Whole streams are timed under
+"generate.local.stream" so they stay out of the response delay, and a local
+stream cancelled before its first token is sampled at the time it had
+waited, so lost hedges do not pull the first-token p95 down.
+
+Hedges spend Gemini quota. Each one is priced up front (prompt tokens plus
+HEDGE_OUTPUT_ESTIMATE) and admitted only while it fits in the remaining
+daily budget and in HEDGE_BUDGET_FRACTION of it. Reservations are counted in
+one Redis counter per day (REDIS_HEDGE_KEY_PREFIX + date), so the fraction
+holds across all workers; while Redis is unreachable a worker counts locally.
+A cloud leg cancelled before Gemini reported its usage is charged its
+estimate in the shared Gemini token count.
+"""
+import asyncio
+import datetime
+import logging
+import os
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from orchestrator.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_P95_FACTOR = float(os.getenv("HEDGE_P95_FACTOR", "1.0"))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", "1500"))
+HEDGE_MAX_DELAY_MS = float(os.getenv("HEDGE_MAX_DELAY_MS", "30000"))
+HEDGE_DEFAULT_DELAY_MS = float(os.getenv("HEDGE_DEFAULT_DELAY_MS", "10000"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_BUDGET_FRACTION = float(os.getenv("HEDGE_BUDGET_FRACTION", "0.2"))
+HEDGE_OUTPUT_ESTIMATE = 512  # tokens assumed for a hedged Gemini answer
+REDIS_HEDGE_KEY_PREFIX = "talos:hedge:tokens:"  # + YYYY-MM-DD
+REDIS_HEDGE_TTL = 2 * 86400
+
+STAGE_LOCAL = "generate.local"
+STAGE_LOCAL_STREAM = "generate.local.stream"
+STAGE_LOCAL_FIRST_TOKEN = "generate.local.first_token"
+
+
+# Reserve ARGV[1] tokens unless that takes the day's total past ARGV[2].
+_RESERVE_SCRIPT = """
+local spent = redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if spent > tonumber(ARGV[2]) then
+  return {0, redis.call('DECRBY', KEYS[1], ARGV[1])}
+end
+return {1, spent}
+"""
+
+
+class HedgeFailed(Exception):
+    """Both the local and the hedged cloud request failed; don't fall back again."""
+
+
+class Hedger:
+    def __init__(self) -> None:
+        self.requests = 0
+        self.hedges = 0
+        self.local_wins = 0
+        self.cloud_wins = 0
+        self.skipped_budget = 0
+        self._day = datetime.date.today()
+        self._spent_today = 0
+
+    @property
+    def enabled(self) -> bool:
+        return HEDGE_ENABLED
+
+    def delay_ms(self, stage: str) -> float:
+        p95 = tracer.percentile(stage, 0.95, min_samples=HEDGE_MIN_SAMPLES)
+        if p95 is None:
+            return HEDGE_DEFAULT_DELAY_MS
+        return min(max(p95 * HEDGE_P95_FACTOR, HEDGE_MIN_DELAY_MS), HEDGE_MAX_DELAY_MS)
+
+    async def _admit(self, prompt: str, system: Optional[str]) -> int:
+        """Reserve estimated Gemini tokens for one hedge. Returns the reservation, 0 if refused."""
+        from intelligence.gemini_client import GEMINI_MAX_TOKENS_PER_DAY, get_status
+        from intelligence.token_budget import count_tokens
+
+        today = datetime.date.today()
+        if today != self._day:
+            self._day, self._spent_today = today, 0
+
+        status = get_status()
+        cost = count_tokens(prompt) + count_tokens(system) + HEDGE_OUTPUT_ESTIMATE
+        cap = int(HEDGE_BUDGET_FRACTION * GEMINI_MAX_TOKENS_PER_DAY)
+        if not status.get("available") or cost > status.get("tokens_remaining", 0):
+            self.skipped_budget += 1
+            return 0
+        try:
+            from memory.redis_client import run_script
+            admitted, self._spent_today = await run_script(
+                _RESERVE_SCRIPT, [REDIS_HEDGE_KEY_PREFIX + today.isoformat()], [cost, cap, REDIS_HEDGE_TTL]
+            )
+        except Exception as exc:
+            logger.debug("Hedge budget reservation failed, counting locally: %s", exc)
+            admitted = self._spent_today + cost <= cap
+            if admitted:
+                self._spent_today += cost
+        if not admitted:
+            self.skipped_budget += 1
+            return 0
+        return cost
+
+    @staticmethod
+    async def _charge_abandoned(tokens: int) -> None:
+        """Count a cancelled cloud leg's estimate; Gemini never reported what it used."""
+        from intelligence.gemini_client import record_abandoned
+        await record_abandoned(tokens)
+
+    async def call(
+        self,
+        local: Awaitable[T],
+        start_cloud: Callable[[], Awaitable[T]],
+        prompt: str,
+        system: Optional[str],
+    ) -> T:
+        """Await `local`; hedge with start_cloud() if it is slower than the delay."""
+        self.requests += 1
+        local_task = asyncio.ensure_future(local)
+        legs = {local_task: "local"}
+        reserved = 0
+        try:
+            delay = self.delay_ms(STAGE_LOCAL) / 1000
+            done, _ = await asyncio.wait({local_task}, timeout=delay)
+            if not done:
+                reserved = await self._admit(prompt, system)
+            if not reserved:
+                return await local_task
+
+            self.hedges += 1
+            logger.info("Local call slower than %.1fs — hedging with Gemini", delay)
+            legs[asyncio.ensure_future(start_cloud())] = "cloud"
+            pending = set(legs)
+            errors: list[BaseException] = []
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record_win(legs[task])
+                        return task.result()
+                    errors.append(task.exception())  # type: ignore[arg-type]
+            raise HedgeFailed(f"local and cloud both failed: {errors}")
+        finally:
+            losers = [task for task in legs if not task.done()]
+            for task in losers:
+                task.cancel()  # the loser, or everything if we were cancelled
+            await asyncio.gather(*losers, return_exceptions=True)
+            if any(legs[task] == "cloud" for task in losers):
+                await self._charge_abandoned(reserved)
+
+    async def stream(
+        self,
+        local: AsyncIterator[str],
+        start_cloud: Callable[[], AsyncIterator[str]],
+        prompt: str,
+        system: Optional[str],
+    ) -> AsyncIterator[str]:
+        """Stream `local`; hedge with start_cloud() if its first token is later than the delay."""
+        self.requests += 1
+        local_first = asyncio.ensure_future(local.__anext__())
+        delay = self.delay_ms(STAGE_LOCAL_FIRST_TOKEN) / 1000
+        try:
+            done, _ = await asyncio.wait({local_first}, timeout=delay)
+        except BaseException:
+            local_first.cancel()
+            raise
+
+        winner, first = local, local_first
+        reserved = 0
+        if not done:
+            try:
+                reserved = await self._admit(prompt, system)
+            except BaseException:
+                local_first.cancel()
+                raise
+        if reserved:
+            self.hedges += 1
+            logger.info("No local token after %.1fs — hedging with Gemini", delay)
+            cloud = start_cloud()
+            cloud_first = asyncio.ensure_future(cloud.__anext__())
+            legs = {local_first: (local, "local"), cloud_first: (cloud, "cloud")}
+            pending = set(legs)
+            errors: list[BaseException] = []
+            winner = None
+            try:
+                while pending and winner is None:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None and winner is None:
+                            winner, first = legs[task][0], task
+                            self._record_win(legs[task][1])
+                        elif task.exception() is not None:
+                            errors.append(task.exception())  # type: ignore[arg-type]
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                for gen, _ in legs.values():
+                    if gen is not winner:
+                        await gen.aclose()  # type: ignore[attr-defined]
+                if winner is not cloud and (cloud_first.cancelled() or cloud_first.exception() is None):
+                    # Cancelled, or outpaced after it had started answering.
+                    await self._charge_abandoned(reserved)
+            if winner is None:
+                raise HedgeFailed(f"local and cloud both failed: {errors}")
+
+        try:
+            try:
+                yield await first
+            except StopAsyncIteration:
+                return
+            async for token in winner:
+                yield token
+        finally:
+            if not first.done():
+                first.cancel()
+                await asyncio.gather(first, return_exceptions=True)
+            await winner.aclose()  # type: ignore[attr-defined]
+
+    def _record_win(self, leg: str) -> None:
+        if leg == "local":
+            self.local_wins += 1
+        else:
+            self.cloud_wins += 1
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_rate": round(self.hedges / self.requests, 3) if self.requests else 0.0,
+            "local_wins": self.local_wins,
+            "cloud_wins": self.cloud_wins,
+            "cloud_win_ratio": round(self.cloud_wins / self.hedges, 3) if self.hedges else 0.0,
+            "skipped_budget": self.skipped_budget,
+            "tokens_reserved_today": self._spent_today,
+            "delay_ms": {
+                "response": round(self.delay_ms(STAGE_LOCAL), 1),
+                "first_token": round(self.delay_ms(STAGE_LOCAL_FIRST_TOKEN), 1),
+            },
+        }
+
+
+# Module-level singleton
+hedger = Hedger()
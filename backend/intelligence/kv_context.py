@@ -0,0 +1,136 @@
+"""Per-session reuse of Ollama's KV `context` array.
+
+/api/generate returns `context`, the token ids of the conversation so far.
+Sending it back with the next request continues the conversation without
+re-processing it. The router keeps each session's latest array in Redis
+(talos:session:kv:<session_id>, TTL KV_CONTEXT_TTL). The array is packed as
+base64 uint32, and arrays longer than KV_CONTEXT_MAX_TOKENS are not stored.
+
+When a stored context exists for the target model, the router sends only the
+continuation prompt, i.e. the prompt without the recent-turns block, since
+those turns are already in the context. Otherwise it sends the full prompt
+as before. A context belongs to one model: after a swap to another model,
+or once it expires, the turn simply falls back to the full prompt.
+
+The record must stay in step with the session window. A turn answered any
+other way (response cache, semantic cache, Gemini, batch) drops the record,
+so the next local turn re-prefills from the full prompt.
+"""
+import base64
+import logging
+import os
+from array import array
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+KV_CONTEXT_ENABLED = os.getenv("KV_CONTEXT_ENABLED", "true").lower() == "true"
+KV_CONTEXT_TTL = int(os.getenv("KV_CONTEXT_TTL", "1800"))
+KV_CONTEXT_MAX_TOKENS = int(os.getenv("KV_CONTEXT_MAX_TOKENS", "6144"))
+KV_CONTEXT_KEY_PREFIX = "talos:session:kv:"
+
+
+def _pack(tokens: list[int]) -> str:
+    return base64.b64encode(array("I", tokens).tobytes()).decode()
+
+
+def _unpack(packed: str) -> list[int]:
+    tokens = array("I")
+    tokens.frombytes(base64.b64decode(packed))
+    return tokens.tolist()
+
+
+class SessionTurn:
+    """One routed turn: the context to send, and the context to keep afterwards."""
+
+    def __init__(self, store: "KVContextStore", session_id: Optional[str], model: str,
+                 context: Optional[list[int]], had_record: bool) -> None:
+        self._store = store
+        self.session_id = session_id
+        self.model = model
+        self.context = context
+        self.new_context: Optional[list[int]] = None  # set by the local call
+        self._had_record = had_record
+
+    def prompt(self, full: str, continuation: Optional[str]) -> str:
+        return continuation if self.context is not None and continuation is not None else full
+
+    def receive(self, tokens: list[int]) -> None:
+        """on_context callback for ollama_client.generate/generate_stream."""
+        self.new_context = tokens
+
+    async def commit(self) -> None:
+        """Save the new context, or drop the stale one if this turn produced none."""
+        if not self.session_id:
+            return
+        if self.new_context is not None:
+            await self._store.save(self.session_id, self.model, self.new_context)
+        elif self._had_record:
+            await self._store.invalidate(self.session_id)
+
+
+class KVContextStore:
+    def __init__(self) -> None:
+        self.reused = 0
+        self.misses = 0
+        self.saved = 0
+        self.oversize = 0
+        self.invalidated = 0
+
+    async def begin(self, session_id: Optional[str], model: str, eligible: bool = True) -> SessionTurn:
+        """Load the session's context if it can be reused for `model`."""
+        if not KV_CONTEXT_ENABLED or not session_id:
+            return SessionTurn(self, None, model, None, False)
+        try:
+            from memory.redis_client import get_value
+            record = await get_value(KV_CONTEXT_KEY_PREFIX + session_id)
+        except Exception as exc:
+            logger.debug("KV context load failed: %s", exc)
+            record = None
+        if not isinstance(record, dict):
+            return SessionTurn(self, session_id, model, None, False)
+        if not eligible or record.get("model") != model:
+            self.misses += 1
+            return SessionTurn(self, session_id, model, None, True)
+        self.reused += 1
+        return SessionTurn(self, session_id, model, _unpack(record["tokens"]), True)
+
+    async def save(self, session_id: str, model: str, tokens: list[int]) -> None:
+        if len(tokens) > KV_CONTEXT_MAX_TOKENS:
+            self.oversize += 1
+            await self.invalidate(session_id)
+            return
+        try:
+            from memory.redis_client import set_value
+            await set_value(
+                KV_CONTEXT_KEY_PREFIX + session_id,
+                {"model": model, "tokens": _pack(tokens)},
+                ttl=KV_CONTEXT_TTL,
+            )
+            self.saved += 1
+        except Exception as exc:
+            logger.debug("KV context save failed: %s", exc)
+
+    async def invalidate(self, session_id: Optional[str]) -> None:
+        if not KV_CONTEXT_ENABLED or not session_id:
+            return
+        try:
+            from memory.redis_client import delete_key
+            if await delete_key(KV_CONTEXT_KEY_PREFIX + session_id):
+                self.invalidated += 1
+        except Exception as exc:
+            logger.debug("KV context invalidate failed: %s", exc)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": KV_CONTEXT_ENABLED,
+            "reused": self.reused,
+            "misses": self.misses,
+            "saved": self.saved,
+            "oversize": self.oversize,
+            "invalidated": self.invalidated,
+        }
+
+
+# Module-level singleton
+kv_context = KVContextStore()
@@ -1,9 +1,21 @@
-"""Ollama client — Qwen Coder 7B and Qwen VL via local Ollama server."""
+"""Ollama client — Qwen Coder 7B and Qwen VL via local Ollama server(s).
+
+OLLAMA_URLS (comma-separated, see parse_hosts) lists every Ollama host; it
+defaults to the single OLLAMA_URL. Every function takes an optional `host`
+and uses the first host when none is given. Host selection lives in
+intelligence.ollama_pool.
+
+Generation requests set options.num_ctx from intelligence.token_budget; each
+host remembers the window its loaded models run with, so a request that still
+fits does not make Ollama reload the runner. keep_alive comes from the
+adaptive policy in intelligence.prewarm.
+"""
 import asyncio
 import json
 import logging
 import os
-from typing import AsyncIterator, Optional
+from typing import AsyncIterator, Callable, Optional
+from urllib.parse import urlparse
 
 import httpx
 
@@ -13,53 +25,121 @@ OLLAMA_BASE_URL = os.getenv("OLLAMA_URL", "http://ollama:11434")
 QWEN_CODER_MODEL = os.getenv("QWEN_CODER_MODEL", "qwen2.5-coder:7b")
 QWEN_VL_MODEL = os.getenv("QWEN_VL_MODEL", "qwen2.5vl:7b")
 
-_http: Optional[httpx.AsyncClient] = None
 
+class OllamaHost:
+    """One Ollama server, with its own HTTP client."""
 
-def _get_http() -> httpx.AsyncClient:
-    global _http
-    if _http is None or _http.is_closed:
-        _http = httpx.AsyncClient(base_url=OLLAMA_BASE_URL, timeout=120.0)
-    return _http
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.name = urlparse(self.base_url).netloc or self.base_url
+        self._http: Optional[httpx.AsyncClient] = None
+        self.num_ctx: dict[str, int] = {}  # model name -> context window it is (or was last) loaded with
+        self.num_ctx_run: dict[str, list[int]] = {}  # see token_budget.pick_num_ctx
 
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=120.0)
+        return self._http
 
-async def is_available() -> bool:
+    def __repr__(self) -> str:
+        return f"OllamaHost({self.name})"
+
+
+def parse_hosts(urls: str) -> list[OllamaHost]:
+    """One OllamaHost per comma-separated base URL."""
+    return [OllamaHost(u.strip()) for u in urls.split(",") if u.strip()]
+
+
+HOSTS = parse_hosts(os.getenv("OLLAMA_URLS", OLLAMA_BASE_URL))
+
+
+def _get_http(host: Optional[OllamaHost] = None) -> httpx.AsyncClient:
+    return (host or HOSTS[0]).http()
+
+
+async def is_available(timeout: Optional[float] = None, host: Optional[OllamaHost] = None) -> bool:
+    """Direct probe. Request-path callers should use endpoint_monitor instead."""
     try:
-        r = await _get_http().get("/api/tags")
+        kwargs = {"timeout": timeout} if timeout is not None else {}
+        r = await _get_http(host).get("/api/tags", **kwargs)
         return r.status_code == 200
     except Exception:
         return False
 
 
-async def list_local_models() -> list[str]:
+async def list_local_models(host: Optional[OllamaHost] = None) -> list[str]:
     try:
-        r = await _get_http().get("/api/tags")
+        r = await _get_http(host).get("/api/tags")
         r.raise_for_status()
         return [m["name"] for m in r.json().get("models", [])]
     except Exception as exc:
-        logger.error("Failed to list Ollama models: %s", exc)
+        logger.error("Failed to list Ollama models on %s: %s", (host or HOSTS[0]).name, exc)
         return []
 
 
-async def pull_model_to_vram(model_name: str) -> None:
-    """Ask Ollama to keep model hot by running an empty generation."""
+async def running_models(host: Optional[OllamaHost] = None) -> list[str]:
+    """Models currently resident in VRAM (/api/ps). Raises if the host can't be reached."""
+    r = await _get_http(host).get("/api/ps", timeout=10.0)
+    r.raise_for_status()
+    return [m.get("name") or m.get("model", "") for m in r.json().get("models", [])]
+
+
+def _options(
+    host: OllamaHost,
+    model: str,
+    prompt: str,
+    system: Optional[str],
+    images: Optional[list[str]],
+    temperature: float,
+    max_tokens: int,
+    context: Optional[list[int]] = None,
+) -> dict:
+    from intelligence.token_budget import estimate_request_tokens, pick_num_ctx
+    needed = estimate_request_tokens(prompt, system, images, max_tokens) + len(context or ())
+    num_ctx = pick_num_ctx(needed, host.num_ctx.get(model), host.num_ctx_run.setdefault(model, []))
+    host.num_ctx[model] = num_ctx
+    return {"temperature": temperature, "num_predict": max_tokens, "num_ctx": num_ctx}
+
+
+def _keep_alive(model: str) -> str:
+    from intelligence.prewarm import warm_policy
+    return warm_policy.keep_alive("coder" if model == QWEN_CODER_MODEL else "vl")
+
+
+async def pull_model_to_vram(model_name: str, host: Optional[OllamaHost] = None) -> None:
+    """Ask Ollama to keep model hot by running an empty generation.
+
+    The model is loaded with the window it last ran with on this host (or the
+    host's widest current window), so the next real request does not reload it.
+    """
+    from intelligence.token_budget import NUM_CTX_BUCKETS
+    host = host or HOSTS[0]
+    num_ctx = host.num_ctx.get(model_name) or max(host.num_ctx.values(), default=NUM_CTX_BUCKETS[0])
     try:
-        await _get_http().post(
+        await _get_http(host).post(
             "/api/generate",
-            json={"model": model_name, "prompt": "", "keep_alive": "10m"},
+            json={
+                "model": model_name,
+                "prompt": "",
+                "keep_alive": _keep_alive(model_name),
+                "options": {"num_ctx": num_ctx},
+            },
             timeout=60.0,
         )
+        host.num_ctx[model_name] = num_ctx
         logger.info("Model %s warmed in VRAM", model_name)
     except Exception as exc:
         logger.error("Failed to pull %s into VRAM: %s", model_name, exc)
         raise
 
 
-async def unload_model() -> None:
+async def unload_model(host: Optional[OllamaHost] = None) -> None:
     """Tell Ollama to release all models from VRAM."""
+    host = host or HOSTS[0]
+    # host.num_ctx is kept: the next load reuses the window the model last ran with.
     for model in [QWEN_CODER_MODEL, QWEN_VL_MODEL]:
         try:
-            await _get_http().post(
+            await _get_http(host).post(
                 "/api/generate",
                 json={"model": model, "prompt": "", "keep_alive": "0"},
                 timeout=30.0,
@@ -76,27 +156,38 @@ async def generate(
     temperature: float = 0.7,
     max_tokens: int = 2048,
     images: Optional[list[str]] = None,
+    host: Optional[OllamaHost] = None,
+    context: Optional[list[int]] = None,
+    on_context: Optional[Callable[[list[int]], None]] = None,
 ) -> str:
-    """Generate a response from a Qwen model."""
+    """Generate a response from a Qwen model.
+
+    `context` continues a previous generation (see intelligence.kv_context);
+    `on_context` receives the context array Ollama returns for this one.
+    """
     model = QWEN_CODER_MODEL if model_type == "coder" else QWEN_VL_MODEL
+    host = host or HOSTS[0]
 
     payload: dict = {
         "model": model,
         "prompt": prompt,
         "stream": False,
-        "options": {
-            "temperature": temperature,
-            "num_predict": max_tokens,
-        },
+        "options": _options(host, model, prompt, system, images, temperature, max_tokens, context),
+        "keep_alive": _keep_alive(model),
     }
     if system:
         payload["system"] = system
     if images:
         payload["images"] = images
+    if context:
+        payload["context"] = context
 
-    r = await _get_http().post("/api/generate", json=payload, timeout=120.0)
+    r = await _get_http(host).post("/api/generate", json=payload, timeout=120.0)
     r.raise_for_status()
-    return r.json().get("response", "")
+    data = r.json()
+    if on_context and data.get("context"):
+        on_context(data["context"])
+    return data.get("response", "")
 
 
 async def generate_stream(
@@ -105,20 +196,30 @@ async def generate_stream(
     system: Optional[str] = None,
     temperature: float = 0.7,
     max_tokens: int = 2048,
+    images: Optional[list[str]] = None,
+    host: Optional[OllamaHost] = None,
+    context: Optional[list[int]] = None,
+    on_context: Optional[Callable[[list[int]], None]] = None,
 ) -> AsyncIterator[str]:
-    """Stream a response token by token."""
+    """Stream a response token by token. `context`/`on_context` as in generate()."""
     model = QWEN_CODER_MODEL if model_type == "coder" else QWEN_VL_MODEL
+    host = host or HOSTS[0]
 
     payload = {
         "model": model,
         "prompt": prompt,
         "stream": True,
-        "options": {"temperature": temperature, "num_predict": max_tokens},
+        "options": _options(host, model, prompt, system, images, temperature, max_tokens, context),
+        "keep_alive": _keep_alive(model),
     }
     if system:
         payload["system"] = system
+    if images:
+        payload["images"] = images
+    if context:
+        payload["context"] = context
 
-    async with _get_http().stream("POST", "/api/generate", json=payload, timeout=120.0) as r:
+    async with _get_http(host).stream("POST", "/api/generate", json=payload, timeout=120.0) as r:
         r.raise_for_status()
         async for line in r.aiter_lines():
             if line.strip():
@@ -128,18 +229,20 @@ async def generate_stream(
                     if token:
                         yield token
                     if chunk.get("done"):
+                        if on_context and chunk.get("context"):
+                            on_context(chunk["context"])
                         break
                 except json.JSONDecodeError:
                     pass
 
 
-async def ensure_models_pulled() -> None:
+async def ensure_models_pulled(host: Optional[OllamaHost] = None) -> None:
     """Pull required models if not already downloaded."""
-    existing = await list_local_models()
+    existing = await list_local_models(host)
     for model in [QWEN_CODER_MODEL, QWEN_VL_MODEL]:
         if not any(model in m for m in existing):
             logger.info("Pulling model %s (this may take a while)...", model)
-            async with _get_http().stream(
+            async with _get_http(host).stream(
                 "POST", "/api/pull",
                 json={"name": model},
                 timeout=3600.0,
@@ -0,0 +1,138 @@
+"""Ollama host pool — model-affinity load balancing across GPU boxes.
+
+Each host gets its own VRAMMutex, so swaps and concurrency limits are per
+GPU; the module-level pool is built from ollama_client.HOSTS with the global
+vram_mutex for the first host. Health comes from an EndpointMonitor (the
+global endpoint_monitor unless one is passed), one service per host
+("ollama@<host>").
+
+Selection for a model type:
+  1. healthy hosts with that model resident and a free slot, least loaded first
+  2. otherwise the least-loaded healthy host, preferring ones with the model
+     resident, then ones with nothing loaded (no unload needed)
+If no host is known healthy, all hosts are considered.
+
+Each mutex's idea of the resident model is reconciled with Ollama's
+/api/ps at startup and every VRAM_RECONCILE_INTERVAL seconds, so a model
+left loaded across a backend restart is reused instead of cold-loaded
+again, and one Ollama expired after keep_alive is not counted as resident.
+"""
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from intelligence.ollama_client import HOSTS, OllamaHost
+from intelligence.vram_mutex import VRAMMutex, VRAM_MAX_CONCURRENT, vram_mutex
+
+if TYPE_CHECKING:
+    from intelligence.endpoint_monitor import EndpointMonitor
+
+logger = logging.getLogger(__name__)
+
+VRAM_RECONCILE_INTERVAL = float(os.getenv("VRAM_RECONCILE_INTERVAL", "60"))
+
+
+@dataclass
+class PoolMember:
+    host: OllamaHost
+    mutex: VRAMMutex
+
+    @property
+    def service(self) -> str:
+        return f"ollama@{self.host.name}"
+
+    def has_resident(self, model_type: str) -> bool:
+        return model_type in (self.mutex.loaded_model, self.mutex.holder_model)
+
+
+class OllamaPool:
+    def __init__(
+        self,
+        hosts: list[OllamaHost],
+        mutexes: Optional[list[VRAMMutex]] = None,
+        monitor: Optional["EndpointMonitor"] = None,
+    ) -> None:
+        if mutexes is None:
+            mutexes = [VRAMMutex(host=host) for host in hosts]
+        if len(mutexes) != len(hosts):
+            raise ValueError(f"{len(hosts)} hosts but {len(mutexes)} VRAM mutexes")
+        self.members = [PoolMember(host, mutex) for host, mutex in zip(hosts, mutexes)]
+        self._monitor = monitor
+        self._reconcile_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Reconcile every healthy host now, then keep doing it in the background."""
+        await self.reconcile()
+        if VRAM_RECONCILE_INTERVAL > 0 and (self._reconcile_task is None or self._reconcile_task.done()):
+            self._reconcile_task = asyncio.create_task(self._run_reconcile())
+
+    def stop(self) -> None:
+        if self._reconcile_task is not None:
+            self._reconcile_task.cancel()
+            self._reconcile_task = None
+
+    async def reconcile(self) -> None:
+        await asyncio.gather(*(m.mutex.reconcile() for m in self.healthy()))
+
+    async def _run_reconcile(self) -> None:
+        while True:
+            await asyncio.sleep(VRAM_RECONCILE_INTERVAL)
+            try:
+                await self.reconcile()
+            except Exception as exc:
+                logger.warning("VRAM reconcile failed: %s", exc)
+
+    def healthy(self) -> list[PoolMember]:
+        monitor = self._monitor
+        if monitor is None:
+            from intelligence.endpoint_monitor import endpoint_monitor as monitor
+        return [m for m in self.members if monitor.is_available(m.service)]
+
+    def select(self, model_type: str, weight: int = 1) -> PoolMember:
+        """Pick a host for `weight` requests of model_type and record them with the warm policy."""
+        from intelligence.prewarm import warm_policy
+        member = self._select(model_type)
+        warm_policy.observe(member, model_type, weight)
+        return member
+
+    def _select(self, model_type: str) -> PoolMember:
+        candidates = self.healthy() or self.members
+        if len(candidates) == 1:
+            return candidates[0]
+
+        with_room = [
+            m for m in candidates
+            if m.has_resident(model_type) and m.mutex.load < VRAM_MAX_CONCURRENT
+        ]
+        if with_room:
+            return min(with_room, key=lambda m: m.mutex.load)
+
+        return min(candidates, key=lambda m: (
+            m.mutex.load,
+            not m.has_resident(model_type),
+            m.mutex.loaded_model is not None,
+        ))
+
+    def member_for(self, host: OllamaHost) -> PoolMember:
+        for m in self.members:
+            if m.host is host:
+                return m
+        raise KeyError(host.name)
+
+    def stats(self) -> dict:
+        return {
+            m.host.name: {
+                "loaded_model": m.mutex.loaded_model,
+                "state": m.mutex.state.name,
+                "load": m.mutex.load,
+                "num_ctx": dict(m.host.num_ctx),
+                **{k: v for k, v in m.mutex.stats().items() if k in ("holders", "swaps", "grants", "reconciled")},
+            }
+            for m in self.members
+        }
+
+
+# Module-level singleton
+ollama_pool = OllamaPool(HOSTS, [vram_mutex, *(VRAMMutex(host=host) for host in HOSTS[1:])])
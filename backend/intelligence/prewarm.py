@@ -0,0 +1,207 @@
+"""Predictive model pre-warming and adaptive keep_alive.
+
+Every local request seen by ollama_pool.select() is recorded in a per-hour
+request mix (an exponentially decayed count per model type for each hour of
+the day, persisted in Redis). Every PREWARM_INTERVAL seconds the policy
+predicts the likely model for the current hour (the next hour counts half).
+If that model is not resident on any healthy host, it is loaded through the
+VRAMMutex of a host that has been idle for PREWARM_IDLE_SECONDS and has free
+VRAM: nothing loaded, or a model whose keep_alive has run out since its last
+request there. A model still inside its keep_alive is never evicted for a
+prediction. The load then happens in the background and not in front of the
+next request. The tick takes the VRAM slot only if it is free at once and
+never queues behind requests. The next request on that host counts as a hit
+if it wants the pre-warmed model and as a miss otherwise.
+
+keep_alive is tuned per model type from the gaps between its requests
+(p90 of recent gaps x KEEP_ALIVE_FACTOR, clamped to
+[KEEP_ALIVE_MIN, KEEP_ALIVE_MAX]) instead of a fixed "10m".
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from intelligence.ollama_pool import PoolMember
+
+logger = logging.getLogger(__name__)
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", "30"))
+PREWARM_IDLE_SECONDS = float(os.getenv("PREWARM_IDLE_SECONDS", "20"))
+PREWARM_MIN_SHARE = float(os.getenv("PREWARM_MIN_SHARE", "0.6"))
+PREWARM_MIN_SAMPLES = 20.0
+PREWARM_DECAY = 0.99  # per request, within an hour slot
+KEEP_ALIVE_DEFAULT = 600
+KEEP_ALIVE_MIN = int(os.getenv("KEEP_ALIVE_MIN", "300"))
+KEEP_ALIVE_MAX = int(os.getenv("KEEP_ALIVE_MAX", "3600"))
+KEEP_ALIVE_FACTOR = 1.5
+KEEP_ALIVE_MIN_GAPS = 10
+REDIS_MIX_KEY = "talos:prewarm:mix"
+
+
+class WarmPolicy:
+    def __init__(self) -> None:
+        self._mix: dict[int, dict[str, float]] = {}  # hour -> model type -> decayed count
+        self._gaps: dict[str, deque[float]] = {}
+        self._last_seen: dict[str, float] = {}
+        self._pending: dict[str, str] = {}  # host name -> pre-warmed model type
+        self._dirty = False
+        self._task: Optional[asyncio.Task] = None
+        self.prewarms = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def start(self) -> None:
+        await self._load()
+        if PREWARM_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+        logger.info("Warm policy started (prewarm=%s)", PREWARM_ENABLED)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._save()
+
+    # ── Learning ─────────────────────────────────────────────────────────────
+
+    def observe(self, member: "PoolMember", model_type: str, weight: int = 1) -> None:
+        """Record a local request routed to `member` (called by ollama_pool.select)."""
+        now = time.time()
+        slot = self._mix.setdefault(time.localtime(now).tm_hour, {})
+        for m in slot:
+            slot[m] *= PREWARM_DECAY ** weight
+        slot[model_type] = slot.get(model_type, 0.0) + weight
+        self._dirty = True
+
+        last = self._last_seen.get(model_type)
+        if last is not None:
+            self._gaps.setdefault(model_type, deque(maxlen=200)).append(now - last)
+        self._last_seen[model_type] = now
+
+        predicted = self._pending.pop(member.host.name, None)
+        if predicted is not None:
+            if predicted == model_type:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def predict(self) -> tuple[Optional[str], float]:
+        """(likely model type, its share) for now, or (None, 0.0) without enough history."""
+        hour = time.localtime().tm_hour
+        scores: dict[str, float] = {}
+        for h, w in ((hour, 1.0), ((hour + 1) % 24, 0.5)):
+            for model_type, count in self._mix.get(h, {}).items():
+                scores[model_type] = scores.get(model_type, 0.0) + w * count
+        total = sum(scores.values())
+        if total < PREWARM_MIN_SAMPLES:
+            return None, 0.0
+        best = max(scores, key=scores.__getitem__)
+        return best, scores[best] / total
+
+    def keep_alive(self, model_type: str) -> str:
+        """keep_alive for Ollama, e.g. "900s"."""
+        return f"{int(self.keep_alive_seconds(model_type))}s"
+
+    def keep_alive_seconds(self, model_type: str) -> float:
+        gaps = sorted(self._gaps.get(model_type, ()))
+        if len(gaps) < KEEP_ALIVE_MIN_GAPS:
+            return KEEP_ALIVE_DEFAULT
+        p90 = gaps[int(0.9 * (len(gaps) - 1))]
+        return min(max(p90 * KEEP_ALIVE_FACTOR, KEEP_ALIVE_MIN), KEEP_ALIVE_MAX)
+
+    # ── Pre-warming ──────────────────────────────────────────────────────────
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(PREWARM_INTERVAL)
+            try:
+                await self.tick()
+            except Exception as exc:
+                logger.warning("Pre-warm failed: %s", exc)
+            await self._save()
+
+    async def tick(self) -> None:
+        from intelligence.ollama_pool import ollama_pool
+        from intelligence.vram_mutex import VRAMBusy, VRAMState
+
+        model_type, share = self.predict()
+        if model_type is None or share < PREWARM_MIN_SHARE:
+            return
+        members = ollama_pool.healthy()
+        if any(m.has_resident(model_type) for m in members):
+            return
+        idle = [
+            m for m in members
+            if m.mutex.load == 0
+            and m.mutex.state == VRAMState.IDLE
+            and m.mutex.idle_for() >= PREWARM_IDLE_SECONDS
+            and self._vram_free(m)
+        ]
+        if not idle:
+            return
+        # An empty GPU costs no unload.
+        member = min(idle, key=lambda m: m.mutex.loaded_model is not None)
+        logger.info(
+            "Pre-warming %s on %s (%.0f%% of requests at this hour)",
+            model_type, member.host.name, share * 100,
+        )
+        try:
+            async with member.mutex.acquire(model_type, wait=False):
+                pass
+        except VRAMBusy:
+            logger.debug("Pre-warm skipped: %s became busy", member.host.name)
+            return
+        self.prewarms += 1
+        self._pending[member.host.name] = model_type
+
+    def _vram_free(self, member: "PoolMember") -> bool:
+        """Nothing resident, or the resident model's keep_alive ran out since its last use there."""
+        loaded = member.mutex.loaded_model
+        return loaded is None or member.mutex.idle_for() >= self.keep_alive_seconds(loaded)
+
+    # ── Persistence ──────────────────────────────────────────────────────────
+
+    async def _load(self) -> None:
+        try:
+            from memory.redis_client import get_hash
+            for field, count in (await get_hash(REDIS_MIX_KEY)).items():
+                hour, model_type = field.split(":", 1)
+                self._mix.setdefault(int(hour), {})[model_type] = float(count)
+        except Exception as exc:
+            logger.warning("Could not load request mix from Redis: %s", exc)
+
+    async def _save(self) -> None:
+        if not self._dirty:
+            return
+        try:
+            from memory.redis_client import set_hash
+            await set_hash(REDIS_MIX_KEY, {
+                f"{hour}:{model_type}": round(count, 3)
+                for hour, slot in self._mix.items()
+                for model_type, count in slot.items()
+            })
+            self._dirty = False
+        except Exception as exc:
+            logger.debug("Could not persist request mix: %s", exc)
+
+    def stats(self) -> dict:
+        model_type, share = self.predict()
+        resolved = self.hits + self.misses
+        return {
+            "enabled": PREWARM_ENABLED,
+            "prediction": {"model": model_type, "share": round(share, 3)},
+            "prewarms": self.prewarms,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / resolved, 3) if resolved else 0.0,
+            "keep_alive": {m: self.keep_alive(m) for m in ("coder", "vl")},
+        }
+
+
+# Module-level singleton
+warm_policy = WarmPolicy()
@@ -0,0 +1,129 @@
+"""Exact-match response cache in front of router.route.
+
+Key = sha256 over the final prompt (context included), system prompt, routing
+tier and its configured model, attached images, and generation options.
+Entries live in Redis with a TTL; a sorted-set index (scored by insert time)
+caps the number of entries by evicting the oldest.
+
+Requests generated by sampling (temperature > 0) are not cached unless
+RESPONSE_CACHE_ALLOW_SAMPLED is set, since replaying them changes
+behaviour. That includes requests that leave the temperature to the router
+default (temperature=None), which generate at router.DEFAULT_TEMPERATURE.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "5000"))
+RESPONSE_CACHE_ALLOW_SAMPLED = os.getenv("RESPONSE_CACHE_ALLOW_SAMPLED", "false").lower() == "true"
+
+REDIS_KEY_PREFIX = "talos:cache:response:"
+REDIS_INDEX_KEY = "talos:cache:response_index"
+
+
+def replayable(temperature: Optional[float]) -> bool:
+    """Whether a stored answer may stand in for a fresh generation at this temperature.
+
+    temperature is what the caller asked for; None means the router default.
+    The same rule gates the semantic cache (intelligence.semantic_cache).
+    """
+    if temperature is None:
+        from intelligence.router import DEFAULT_TEMPERATURE
+        temperature = DEFAULT_TEMPERATURE
+    return temperature <= 0 or RESPONSE_CACHE_ALLOW_SAMPLED
+
+
+class ResponseCache:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(
+        prompt: str,
+        system: Optional[str],
+        model: str,
+        images: Optional[list[str]],
+        options: dict,
+    ) -> str:
+        h = hashlib.sha256()
+        h.update(json.dumps({
+            "prompt": prompt,
+            "system": system or "",
+            "model": model,
+            "options": options,
+        }, sort_keys=True).encode())
+        for image in images or []:
+            h.update(hashlib.sha256(image.encode()).digest())
+        return h.hexdigest()
+
+    def cacheable(self, temperature: Optional[float], use_cache: bool = True) -> bool:
+        """Whether this request may read/write the cache (see replayable). Counts bypasses."""
+        if not RESPONSE_CACHE_ENABLED or not use_cache or not replayable(temperature):
+            self.bypassed += 1
+            return False
+        return True
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            from memory.redis_client import get_client
+            r = await get_client()
+            cached = await r.get(REDIS_KEY_PREFIX + key)
+        except Exception as exc:
+            logger.warning("Response cache read failed: %s", exc)
+            cached = None
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return cached
+
+    async def put(self, key: str, response: str) -> None:
+        if not response:
+            return
+        try:
+            from memory.redis_client import get_client
+            r = await get_client()
+            now = time.time()
+            async with r.pipeline(transaction=True) as pipe:
+                pipe.set(REDIS_KEY_PREFIX + key, response, ex=RESPONSE_CACHE_TTL)
+                pipe.zadd(REDIS_INDEX_KEY, {key: now})
+                pipe.zremrangebyscore(REDIS_INDEX_KEY, "-inf", now - RESPONSE_CACHE_TTL)
+                pipe.zcard(REDIS_INDEX_KEY)
+                *_, size = await pipe.execute()
+            self.stores += 1
+
+            overflow = int(size) - RESPONSE_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                evicted = await r.zpopmin(REDIS_INDEX_KEY, overflow)
+                if evicted:
+                    await r.delete(*(REDIS_KEY_PREFIX + k for k, _ in evicted))
+                    self.evictions += len(evicted)
+        except Exception as exc:
+            logger.warning("Response cache write failed: %s", exc)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": RESPONSE_CACHE_ENABLED,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "bypassed": self.bypassed,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+
+# Module-level singleton
+response_cache = ResponseCache()
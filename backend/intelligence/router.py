@@ -6,15 +6,100 @@ Routing logic:
   3. Escalate to Gemini when:
      - Qwen fails or is unavailable
      - Task is explicitly marked complex
-     - Prompt length exceeds local context window
+     - Prompt (in tokens, see intelligence.token_budget) exceeds the
+       largest local context window
+
+Coder requests may be hedged with Gemini when the local model is slow
+(intelligence.hedging, opt-in).
+
+Identical requests are answered from the exact-match response cache
+(intelligence.response_cache) without touching either model, and identical
+concurrent requests share one generation (intelligence.singleflight). A
+response is cached under the tier it was routed to only if that tier
+produced it; a Gemini fallback is not stored under the local model's key.
+
+`temperature=None` means the caller left the temperature to the router:
+generation uses DEFAULT_TEMPERATURE, which samples, so the response is cached
+only when RESPONSE_CACHE_ALLOW_SAMPLED opts in (intelligence.response_cache).
+
+When a session_id is given, local generations continue from the session's
+stored Ollama context (intelligence.kv_context) and only send `continuation`,
+the prompt without the turns that context already holds.
 """
+import asyncio
 import logging
-from typing import Optional
+import os
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Optional, Union
+
+from orchestrator.tracing import tracer
+
+if TYPE_CHECKING:
+    from intelligence.kv_context import SessionTurn
 
 logger = logging.getLogger(__name__)
 
-LOCAL_CONTEXT_LIMIT_CHARS = 30000  # ~32K tokens for Qwen
 ESCALATION_KEYWORDS = {"complex", "analyze", "summarize long", "research"}
+DEFAULT_TEMPERATURE = 0.7
+DEFAULT_MAX_TOKENS = 2048
+BATCH_CHUNK_SIZE = int(os.getenv("BATCH_CHUNK_SIZE", "8"))            # local items per VRAM hold
+BATCH_CLOUD_CONCURRENCY = int(os.getenv("BATCH_CLOUD_CONCURRENCY", "4"))
+
+
+def select_tier(
+    prompt: str,
+    images: Optional[list[str]] = None,
+    force_cloud: bool = False,
+    system: Optional[str] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+) -> str:
+    """Pick the first-choice target: "cloud", "vl" or "coder"."""
+    if force_cloud:
+        return "cloud"
+    # Vision request → Qwen VL
+    if images:
+        return "vl"
+    # Prompt too long for local model
+    from intelligence.token_budget import LOCAL_CONTEXT_LIMIT_TOKENS, estimate_request_tokens, fits_local
+    needed = estimate_request_tokens(prompt, system, max_tokens=max_tokens)
+    if not fits_local(needed):
+        logger.info("Prompt needs ~%d tokens > %d — escalating to Gemini", needed, LOCAL_CONTEXT_LIMIT_TOKENS)
+        return "cloud"
+    return "coder"
+
+
+def model_name_for_tier(tier: str) -> str:
+    from intelligence.ollama_client import QWEN_CODER_MODEL, QWEN_VL_MODEL
+    from intelligence.gemini_client import GEMINI_MODEL
+    return {"cloud": GEMINI_MODEL, "vl": QWEN_VL_MODEL}.get(tier, QWEN_CODER_MODEL)
+
+
+def _effective_temperature(temperature: Optional[float]) -> float:
+    return DEFAULT_TEMPERATURE if temperature is None else temperature
+
+
+async def _cache_lookup(
+    tier: str,
+    prompt: str,
+    system: Optional[str],
+    images: Optional[list[str]],
+    temperature: Optional[float],
+    max_tokens: int,
+    use_cache: bool,
+) -> tuple[Optional[str], Optional[str]]:
+    """Return (cache_key, cached_response). cache_key is None when caching is skipped."""
+    from intelligence.response_cache import response_cache
+
+    if not response_cache.cacheable(temperature, use_cache):
+        return None, None
+    cache_key = response_cache.make_key(
+        prompt, system, model_name_for_tier(tier), images,
+        {"temperature": _effective_temperature(temperature), "max_tokens": max_tokens},
+    )
+    cached = await response_cache.get(cache_key)
+    if cached is not None:
+        logger.debug("Response cache hit (%s)", cache_key[:12])
+    return cache_key, cached
 
 
 async def route(
@@ -23,53 +108,439 @@ async def route(
     model_hint: Optional[str] = None,
     images: Optional[list[str]] = None,
     force_cloud: bool = False,
+    temperature: Optional[float] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+    continuation: Optional[str] = None,
+    user_input: Optional[str] = None,
+    context_sources: Optional[list[str]] = None,
+    served: Optional[list[str]] = None,
 ) -> str:
-    """Route prompt to the appropriate model and return the response."""
-    from intelligence.vram_mutex import vram_mutex
-    from intelligence.ollama_client import generate as ollama_generate, is_available as ollama_ok
-    from intelligence.gemini_client import generate as gemini_generate, get_status
+    """Route prompt to the appropriate model and return the response.
 
-    if force_cloud:
-        return await _call_gemini(prompt, system)
+    user_input and context_sources (ids of what the prompt's context was built
+    from, including session:<id> when the session's recent-turn window is in
+    the prompt) give the key identical concurrent requests are coalesced on;
+    without them the whole prompt is the key. When `served` is given, the
+    tier that produced the response is appended to it.
+    """
+    from intelligence.response_cache import response_cache
 
-    # Vision request → Qwen VL
-    if images:
-        return await _call_local("vl", prompt, system, images=images)
+    tier = select_tier(prompt, images, force_cloud, system, max_tokens)
+    turn = await _begin_turn(session_id, tier, images)
+    cache_key, cached = await _cache_lookup(
+        tier, prompt, system, images, temperature, max_tokens, use_cache
+    )
+    if cached is not None:
+        await turn.commit()
+        if served is not None:
+            served.append(tier)
+        return cached
+
+    from intelligence import singleflight as sf
+
+    async def _generate() -> tuple[str, str]:
+        response, producer = await _route_uncached(
+            tier, prompt, system, images, _effective_temperature(temperature), max_tokens,
+            turn, continuation,
+        )
+        if cache_key and producer == tier:
+            await response_cache.put(cache_key, response)
+        return response, producer
+
+    # Identical concurrent requests share one generation. When the caller
+    # identifies the input, the key is that input plus the context sources;
+    # a non-empty recent-turn window or a continued session context makes
+    # the request session-specific.
+    flight_key = sf.make_key(
+        f"{system or ''}\x00{prompt if user_input is None else user_input}",
+        model_name_for_tier(tier), images,
+        {
+            "temperature": _effective_temperature(temperature),
+            "max_tokens": max_tokens,
+            **({"context": sorted(context_sources or [])} if user_input is not None else {}),
+            **({"session": turn.session_id} if turn.context is not None else {}),
+        },
+    )
+    response, producer = await sf.singleflight.do(flight_key, _generate)
+    await turn.commit()
+    if served is not None:
+        served.append(producer)
+    return response
+
+
+async def _begin_turn(session_id: Optional[str], tier: str, images: Optional[list[str]]):
+    from intelligence.kv_context import kv_context
+    return await kv_context.begin(
+        session_id, model_name_for_tier(tier), eligible=tier != "cloud" and not images
+    )
 
-    # Prompt too long for local model
-    if len(prompt) > LOCAL_CONTEXT_LIMIT_CHARS:
-        logger.info("Prompt length %d > %d — escalating to Gemini", len(prompt), LOCAL_CONTEXT_LIMIT_CHARS)
-        return await _call_gemini(prompt, system)
+
+async def _route_uncached(
+    tier: str,
+    prompt: str,
+    system: Optional[str],
+    images: Optional[list[str]],
+    temperature: float,
+    max_tokens: int,
+    turn: Optional["SessionTurn"] = None,
+    continuation: Optional[str] = None,
+) -> tuple[str, str]:
+    """Return (response, tier that produced it)."""
+    from intelligence.endpoint_monitor import endpoint_monitor
+
+    if tier == "cloud":
+        return await _served("cloud", _call_gemini(prompt, system, temperature))
+
+    if tier == "vl":
+        return await _served("vl", _call_local("vl", prompt, system, temperature, max_tokens, images=images))
 
     # Try local first
-    if await ollama_ok():
+    if endpoint_monitor.is_available("ollama"):
+        from intelligence.hedging import HedgeFailed, hedger
         try:
-            return await _call_local("coder", prompt, system)
+            local = _served("coder", _call_local(
+                "coder", prompt, system, temperature, max_tokens, turn=turn, continuation=continuation
+            ))
+            if hedger.enabled:
+                return await hedger.call(
+                    local, lambda: _served("cloud", _call_gemini(prompt, system, temperature)),
+                    prompt, system,
+                )
+            return await local
+        except HedgeFailed:
+            raise
         except Exception as exc:
             logger.warning("Local model failed: %s — falling back to Gemini", exc)
 
     # Fallback to Gemini
-    return await _call_gemini(prompt, system)
+    return await _served("cloud", _call_gemini(prompt, system, temperature))
+
+
+async def _served(tier: str, response: Awaitable[str]) -> tuple[str, str]:
+    return await response, tier
+
+
+async def _served_stream(tier: str, stream: AsyncIterator[str], served: list[str]) -> AsyncIterator[str]:
+    """Pass `stream` through and record `tier` in `served` once it has been fully consumed."""
+    async for token in stream:
+        yield token
+    served.append(tier)
+
+
+async def route_stream(
+    prompt: str,
+    system: Optional[str] = None,
+    images: Optional[list[str]] = None,
+    force_cloud: bool = False,
+    temperature: Optional[float] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    use_cache: bool = True,
+    session_id: Optional[str] = None,
+    continuation: Optional[str] = None,
+    served: Optional[list[str]] = None,
+) -> AsyncIterator[str]:
+    """Streaming counterpart of route() — yields response text as it is generated.
+
+    Local fallback to Gemini only happens if Qwen fails before emitting its
+    first token; once tokens have been sent there is nothing to retry.
+    A cache hit is yielded as a single chunk. When `served` is given, the
+    tier that produced the response is appended to it once the stream ends.
+    """
+    from intelligence.response_cache import response_cache
+
+    tier = select_tier(prompt, images, force_cloud, system, max_tokens)
+    turn = await _begin_turn(session_id, tier, images)
+    cache_key, cached = await _cache_lookup(
+        tier, prompt, system, images, temperature, max_tokens, use_cache
+    )
+    if cached is not None:
+        await turn.commit()
+        if served is not None:
+            served.append(tier)
+        yield cached
+        return
+
+    parts: list[str] = []
+    served = served if served is not None else []
+    async for token in _route_stream_uncached(
+        tier, prompt, system, images, _effective_temperature(temperature), max_tokens,
+        turn, continuation, served,
+    ):
+        parts.append(token)
+        yield token
+    await turn.commit()
+    if cache_key and served == [tier]:
+        await response_cache.put(cache_key, "".join(parts))
+
+
+async def _route_stream_uncached(
+    tier: str,
+    prompt: str,
+    system: Optional[str],
+    images: Optional[list[str]],
+    temperature: float,
+    max_tokens: int,
+    turn: Optional["SessionTurn"] = None,
+    continuation: Optional[str] = None,
+    served: Optional[list[str]] = None,
+) -> AsyncIterator[str]:
+    """Yield the response; the tier that produced it is appended to `served` at the end."""
+    from intelligence.endpoint_monitor import endpoint_monitor
+
+    served = served if served is not None else []
+    if tier == "cloud":
+        async for token in _served_stream("cloud", _stream_gemini(prompt, system, temperature), served):
+            yield token
+        return
+
+    if tier == "vl":
+        async for token in _served_stream(
+            "vl", _stream_local("vl", prompt, system, temperature, max_tokens, images=images), served
+        ):
+            yield token
+        return
+
+    if endpoint_monitor.is_available("ollama"):
+        from intelligence.hedging import HedgeFailed, hedger
+        emitted = False
+        try:
+            stream = _served_stream("coder", _stream_local(
+                "coder", prompt, system, temperature, max_tokens, turn=turn, continuation=continuation
+            ), served)
+            if hedger.enabled:
+                stream = hedger.stream(
+                    stream,
+                    lambda: _served_stream("cloud", _stream_gemini(prompt, system, temperature), served),
+                    prompt, system,
+                )
+            async for token in stream:
+                emitted = True
+                yield token
+            return
+        except HedgeFailed:
+            raise
+        except Exception as exc:
+            if emitted:
+                raise
+            logger.warning("Local model failed: %s — falling back to Gemini", exc)
+
+    async for token in _served_stream("cloud", _stream_gemini(prompt, system, temperature), served):
+        yield token
+
+
+async def route_group(
+    tier: str,
+    prompts: list[str],
+    images: Optional[list[Optional[list[str]]]] = None,
+    system: Optional[str] = None,
+    temperature: Optional[float] = None,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    use_cache: bool = True,
+) -> list[Union[tuple[str, str], Exception]]:
+    """
+    Generate a group of prompts that all target the same tier (see select_tier).
+    Local groups hold the VRAM slot for BATCH_CHUNK_SIZE prompts at a time, so
+    the model stays resident across the chunk; interactive traffic can still
+    get in between chunks. Coder failures fall back to Gemini as in route().
+    Returns one (response, tier that produced it) or exception per prompt, in
+    input order.
+    """
+    from intelligence.response_cache import response_cache
+
+    images = images or [None] * len(prompts)
+    results: list[Union[str, Exception, None]] = [None] * len(prompts)
+    served: list[Optional[str]] = [None] * len(prompts)  # tier that produced each response
+    cache_keys: list[Optional[str]] = [None] * len(prompts)
+    todo = []
+    for i, prompt in enumerate(prompts):
+        cache_keys[i], cached = await _cache_lookup(
+            tier, prompt, system, images[i], temperature, max_tokens, use_cache
+        )
+        if cached is not None:
+            results[i], served[i] = cached, tier
+        else:
+            todo.append(i)
+
+    from intelligence.endpoint_monitor import endpoint_monitor, ServiceDown
+
+    if tier != "cloud" and not endpoint_monitor.is_available("ollama"):
+        for i in todo:
+            results[i] = ServiceDown("ollama is unavailable")
+    elif tier != "cloud":
+        from intelligence.ollama_pool import ollama_pool
+        from intelligence.ollama_client import generate as ollama_generate
+
+        for start in range(0, len(todo), BATCH_CHUNK_SIZE):
+            chunk = todo[start:start + BATCH_CHUNK_SIZE]
+            member = ollama_pool.select(tier, weight=len(chunk))
+            try:
+                async with member.mutex.acquire(tier):
+                    for i in chunk:
+                        try:
+                            with tracer.span("generate.local", model=tier, host=member.host.name, batch=True):
+                                results[i] = await ollama_generate(
+                                    model_type=tier,
+                                    prompt=prompts[i],
+                                    system=system,
+                                    temperature=_effective_temperature(temperature),
+                                    max_tokens=max_tokens,
+                                    images=images[i],
+                                    host=member.host,
+                                )
+                                served[i] = tier
+                        except Exception as exc:
+                            endpoint_monitor.report_failure(member.service, exc)
+                            results[i] = exc
+            except Exception as exc:
+                # Slot acquire or model load failed for the whole chunk.
+                for i in chunk:
+                    if results[i] is None:
+                        results[i] = exc
+
+    cloud_todo = todo if tier == "cloud" else [
+        i for i in todo if tier == "coder" and isinstance(results[i], Exception)
+    ]
+    if cloud_todo:
+        if tier != "cloud":
+            logger.warning("%d batch items failed locally — falling back to Gemini", len(cloud_todo))
+        limit = asyncio.Semaphore(BATCH_CLOUD_CONCURRENCY)
+
+        async def _cloud(i: int) -> None:
+            async with limit:
+                try:
+                    results[i] = await _call_gemini(prompts[i], system, _effective_temperature(temperature))
+                    served[i] = "cloud"
+                except Exception as exc:
+                    results[i] = exc
+
+        await asyncio.gather(*(_cloud(i) for i in cloud_todo))
+
+    for i in todo:
+        if cache_keys[i] and served[i] == tier and isinstance(results[i], str):
+            await response_cache.put(cache_keys[i], results[i])
+    return [r if isinstance(r, Exception) else (r, served[i]) for i, r in enumerate(results)]
 
 
 async def _call_local(
     model_type: str,
     prompt: str,
     system: Optional[str],
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
     images: Optional[list[str]] = None,
+    turn: Optional["SessionTurn"] = None,
+    continuation: Optional[str] = None,
 ) -> str:
-    from intelligence.vram_mutex import vram_mutex
+    from intelligence.ollama_pool import ollama_pool
     from intelligence.ollama_client import generate as ollama_generate
+    from intelligence.endpoint_monitor import endpoint_monitor
+
+    from intelligence.hedging import STAGE_LOCAL
+
+    member = ollama_pool.select(model_type)
+    async with member.mutex.acquire(model_type):
+        with tracer.span(STAGE_LOCAL, model=model_type, host=member.host.name):
+            try:
+                # Abandon the call as soon as the monitor sees this host go down.
+                return await endpoint_monitor.run_unless_down(member.service, ollama_generate(
+                    model_type=model_type,
+                    prompt=turn.prompt(prompt, continuation) if turn else prompt,
+                    system=system,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    images=images,
+                    host=member.host,
+                    context=turn.context if turn else None,
+                    on_context=turn.receive if turn else None,
+                ))
+            except Exception as exc:
+                endpoint_monitor.report_failure(member.service, exc)
+                raise
+
+
+async def _stream_local(
+    model_type: str,
+    prompt: str,
+    system: Optional[str],
+    temperature: float = DEFAULT_TEMPERATURE,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    images: Optional[list[str]] = None,
+    turn: Optional["SessionTurn"] = None,
+    continuation: Optional[str] = None,
+) -> AsyncIterator[str]:
+    """Hold the VRAM slot for the whole stream, not just until the first token."""
+    from intelligence.ollama_pool import ollama_pool
+    from intelligence.ollama_client import generate_stream
+    from intelligence.endpoint_monitor import endpoint_monitor
+
+    from intelligence.hedging import STAGE_LOCAL_FIRST_TOKEN, STAGE_LOCAL_STREAM
+
+    start = time.monotonic()
+    first = True
+    member = ollama_pool.select(model_type)
+    try:
+        async with member.mutex.acquire(model_type):
+            with tracer.span(STAGE_LOCAL_STREAM, model=model_type, host=member.host.name):
+                try:
+                    async for token in generate_stream(
+                        model_type=model_type,
+                        prompt=turn.prompt(prompt, continuation) if turn else prompt,
+                        system=system,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        images=images,
+                        host=member.host,
+                        context=turn.context if turn else None,
+                        on_context=turn.receive if turn else None,
+                    ):
+                        if first:
+                            # Includes queueing and any model swap — what a hedge waits on.
+                            tracer.record(STAGE_LOCAL_FIRST_TOKEN, (time.monotonic() - start) * 1000)
+                            first = False
+                        yield token
+                except Exception as exc:
+                    endpoint_monitor.report_failure(member.service, exc)
+                    raise
+    except (asyncio.CancelledError, GeneratorExit):
+        if first:
+            # Cut short by a winning hedge: the first token was at least this late.
+            tracer.record(STAGE_LOCAL_FIRST_TOKEN, (time.monotonic() - start) * 1000)
+        raise
 
-    async with vram_mutex.acquire(model_type):
-        return await ollama_generate(
-            model_type=model_type,
+
+async def _call_gemini(
+    prompt: str,
+    system: Optional[str],
+    temperature: Optional[float] = None,
+) -> str:
+    from intelligence.gemini_client import generate as gemini_generate
+    from intelligence.endpoint_monitor import endpoint_monitor
+    start = time.monotonic()
+    with tracer.span("generate.cloud"):
+        response = await gemini_generate(
             prompt=prompt,
-            system=system,
-            images=images,
+            system_instruction=system,
+            temperature=temperature,
         )
+    endpoint_monitor.observe("gemini", (time.monotonic() - start) * 1000)
+    return response
 
 
-async def _call_gemini(prompt: str, system: Optional[str]) -> str:
-    from intelligence.gemini_client import generate as gemini_generate
-    return await gemini_generate(prompt=prompt, system_instruction=system)
+async def _stream_gemini(
+    prompt: str,
+    system: Optional[str],
+    temperature: Optional[float] = None,
+) -> AsyncIterator[str]:
+    from intelligence.gemini_client import generate_stream as gemini_stream
+    from intelligence.endpoint_monitor import endpoint_monitor
+    start = time.monotonic()
+    with tracer.span("generate.cloud", stream=True):
+        async for token in gemini_stream(
+            prompt=prompt,
+            system_instruction=system,
+            temperature=temperature,
+        ):
+            yield token
+    endpoint_monitor.observe("gemini", (time.monotonic() - start) * 1000)
@@ -0,0 +1,137 @@
+"""Semantic response cache — answers near-paraphrases of recent prompts.
+
+Opt-in (SEMANTIC_CACHE_ENABLED). The raw user input is embedded with the
+RAG embedder (callers pass the query vector RAG retrieval already computed)
+and compared against an in-process index of recent answers.
+A stored answer is served when cosine similarity >= SEMANTIC_CACHE_THRESHOLD
+and the entry is younger than SEMANTIC_CACHE_TTL.
+
+Entries are bucketed by a fingerprint of the target model, system prompt
+and the sources of the injected context: the ids of the retrieved memories
+and the session whose recent turns were included. The rendered context is
+not hashed; it carries per-request retrieval scores and would never repeat.
+"""
+import hashlib
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+
+@dataclass
+class _Entry:
+    fingerprint: str
+    vector: np.ndarray
+    response: str
+    created_at: float
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self._threshold = threshold
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()  # oldest first
+        self._buckets: dict[str, set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    @property
+    def enabled(self) -> bool:
+        return SEMANTIC_CACHE_ENABLED
+
+    @staticmethod
+    def fingerprint(model: str, system: Optional[str], sources: list[str]) -> str:
+        h = hashlib.sha256()
+        for part in (model, system or "", *sorted(sources)):
+            h.update(part.encode())
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    async def lookup(
+        self,
+        query_text: str,
+        fingerprint: str,
+        query_vector: Optional[list[float]] = None,
+    ) -> tuple[Optional[str], np.ndarray]:
+        """Return (cached_response or None, query_vector). Pass the vector to store().
+
+        query_text is embedded only when query_vector is not given.
+        """
+        if query_vector is None:
+            from memory.rag import embed
+            query_vector = (await embed([query_text]))[0]
+        vector = np.asarray(query_vector, dtype=np.float32)
+
+        self._expire()
+        ids = list(self._buckets.get(fingerprint, ()))
+        if ids:
+            matrix = np.stack([self._entries[i].vector for i in ids])
+            sims = matrix @ vector  # embeddings are L2-normalised
+            best = int(np.argmax(sims))
+            if sims[best] >= self._threshold:
+                self.hits += 1
+                logger.debug("Semantic cache hit (similarity=%.3f)", float(sims[best]))
+                return self._entries[ids[best]].response, vector
+        self.misses += 1
+        return None, vector
+
+    def store(self, vector: np.ndarray, fingerprint: str, response: str) -> None:
+        if not response:
+            return
+        entry_id = uuid.uuid4().hex
+        self._entries[entry_id] = _Entry(fingerprint, vector, response, time.monotonic())
+        self._buckets.setdefault(fingerprint, set()).add(entry_id)
+        self.stores += 1
+        while len(self._entries) > self._max_entries:
+            self._evict_oldest()
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self._ttl
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.created_at >= cutoff:
+                break
+            self._evict_oldest()
+
+    def _evict_oldest(self) -> None:
+        entry_id, entry = self._entries.popitem(last=False)
+        bucket = self._buckets.get(entry.fingerprint)
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[entry.fingerprint]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "threshold": self._threshold,
+        }
+
+
+# Module-level singleton
+semantic_cache = SemanticCache()
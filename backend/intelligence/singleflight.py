@@ -0,0 +1,69 @@
+"""Single-flight coalescing of identical in-flight generations.
+
+When several callers ask for the same normalised prompt and options at the
+same time, only the first (the leader) runs the generation; the others
+await the same task. The generation runs as its own task, so a leader
+whose client disconnects does not cancel the result for the followers.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.split())
+
+
+def make_key(prompt: str, model: str, images: Optional[list[str]], options: dict) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps({
+        "prompt": normalize_prompt(prompt),
+        "model": model,
+        "options": options,
+    }, sort_keys=True).encode())
+    for image in images or []:
+        h.update(hashlib.sha256(image.encode()).digest())
+    return h.hexdigest()
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("Coalesced onto in-flight generation %s", key[:12])
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        # shield: one caller being cancelled must not cancel the shared task
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved even if every caller went away
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# Module-level singleton
+singleflight = SingleFlight()
@@ -0,0 +1,128 @@
+"""Token-based prompt sizing for the local models.
+
+count_tokens() uses the Qwen tokenizer (LOCAL_TOKENIZER, a Hugging Face repo
+id loaded once with the `tokenizers` library) and falls back to a fast
+regex approximation until the tokenizer is loaded, or when it cannot be.
+The tokenizer is loaded off the event loop by warm() at startup, never on
+the request path.
+
+The estimate drives two decisions:
+  * fits_local() — whether a request fits the largest local context window
+    (router.select_tier escalates to Gemini otherwise)
+  * pick_num_ctx() — the smallest NUM_CTX_BUCKETS entry that fits, sent as
+    options.num_ctx so short prompts use a small KV cache. Ollama reloads the
+    runner when num_ctx changes, so the buckets are coarse and a host keeps
+    its current window while requests still fit in it. After
+    NUM_CTX_SHRINK_AFTER consecutive requests that would all have fit a
+    smaller bucket, the window steps down to the largest of those buckets.
+"""
+import asyncio
+import logging
+import math
+import os
+import re
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TOKENIZER = os.getenv("LOCAL_TOKENIZER", "Qwen/Qwen2.5-Coder-7B-Instruct")
+NUM_CTX_BUCKETS = sorted(
+    int(b) for b in os.getenv("NUM_CTX_BUCKETS", "4096,8192,16384,32768").split(",") if b.strip()
+)
+LOCAL_CONTEXT_LIMIT_TOKENS = NUM_CTX_BUCKETS[-1]
+IMAGE_TOKEN_ESTIMATE = int(os.getenv("IMAGE_TOKEN_ESTIMATE", "1024"))  # per image, Qwen VL
+PROMPT_TEMPLATE_OVERHEAD = 32  # chat template / role markers added by Ollama
+NUM_CTX_SHRINK_AFTER = int(os.getenv("NUM_CTX_SHRINK_AFTER", "8"))  # 0 = never step down
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+_SYMBOL_RE = re.compile(r"[^\w\s]|\d|\n")
+
+_tokenizer = None
+_tokenizer_failed = False
+
+
+def _load_tokenizer() -> None:
+    global _tokenizer, _tokenizer_failed
+    if _tokenizer is not None or _tokenizer_failed or not LOCAL_TOKENIZER:
+        return
+    try:
+        from tokenizers import Tokenizer
+        _tokenizer = Tokenizer.from_pretrained(LOCAL_TOKENIZER)
+        logger.info("Loaded tokenizer %s for prompt sizing", LOCAL_TOKENIZER)
+    except Exception as exc:
+        _tokenizer_failed = True
+        logger.warning("Tokenizer %s unavailable (%s) — using approximate token counts", LOCAL_TOKENIZER, exc)
+
+
+async def warm() -> None:
+    """Load the tokenizer in a worker thread."""
+    await asyncio.to_thread(_load_tokenizer)
+
+
+def _approx_tokens(text: str) -> int:
+    # Words split roughly every 6 chars; digits, punctuation and newlines are
+    # usually their own tokens, which is what char/4 gets wrong for code.
+    words = sum(1 + len(w) // 6 for w in _WORD_RE.findall(text))
+    symbols = len(_SYMBOL_RE.findall(text))
+    return max(words + symbols, math.ceil(len(text) / 4))
+
+
+def count_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    if _tokenizer is not None:
+        return len(_tokenizer.encode(text, add_special_tokens=False).ids)
+    return _approx_tokens(text)
+
+
+def estimate_request_tokens(
+    prompt: str,
+    system: Optional[str] = None,
+    images: Optional[list[str]] = None,
+    max_tokens: int = 0,
+) -> int:
+    """Context tokens a request needs: prompt + system + images + generation budget."""
+    return (
+        count_tokens(prompt)
+        + count_tokens(system)
+        + IMAGE_TOKEN_ESTIMATE * len(images or ())
+        + PROMPT_TEMPLATE_OVERHEAD
+        + max_tokens
+    )
+
+
+def fits_local(needed: int) -> bool:
+    return needed <= LOCAL_CONTEXT_LIMIT_TOKENS
+
+
+def pick_num_ctx(needed: int, current: Optional[int] = None, run: Optional[list[int]] = None) -> int:
+    """Smallest bucket >= needed; keep `current` (the loaded window) if it already fits.
+
+    `run` is the caller's record of consecutive requests that fit a smaller
+    bucket than `current`; it is updated in place, and once it holds
+    NUM_CTX_SHRINK_AFTER of them the window steps down.
+    """
+    bucket = next((b for b in NUM_CTX_BUCKETS if b >= needed), LOCAL_CONTEXT_LIMIT_TOKENS)
+    if current is None or current < needed:
+        if run is not None:
+            run.clear()
+        return bucket
+    if run is None or not NUM_CTX_SHRINK_AFTER:
+        return current
+    if bucket >= current:
+        run.clear()  # this request needed the whole window
+        return current
+    run.append(bucket)
+    if len(run) < NUM_CTX_SHRINK_AFTER:
+        return current
+    smaller = max(run)
+    run.clear()
+    return smaller
+
+
+def stats() -> dict:
+    return {
+        "tokenizer": LOCAL_TOKENIZER if _tokenizer is not None else "approximate",
+        "buckets": NUM_CTX_BUCKETS,
+        "shrink_after": NUM_CTX_SHRINK_AFTER,
+    }
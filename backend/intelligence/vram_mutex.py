@@ -3,6 +3,16 @@
 Spec § 2.1: States IDLE → LOADING_CODER/LOADING_VL → UNLOADING → IDLE
 All state transitions have a 30-second hard timeout.
 State is persisted in Redis for observability.
+
+The slot is handed out by a swap-aware scheduler rather than in arrival
+order: when it frees up, a waiter for the already-loaded model goes first,
+unless some waiter has been queued longer than VRAM_SCHEDULER_MAX_WAIT
+(starvation bound), in which case the oldest waiter goes first.
+
+Up to VRAM_MAX_CONCURRENT requests for the same model hold the slot at
+once, like a per-model read lock; Ollama serves them in parallel. Switching
+to another model is exclusive: new joiners are held back once a waiter for
+another model has aged out, in-flight requests drain, then the swap runs.
 """
 import asyncio
 import logging
@@ -11,8 +21,14 @@ import signal
 import subprocess
 import threading
 import time
+from collections import deque
 from enum import Enum
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
+
+from orchestrator.tracing import tracer
+
+if TYPE_CHECKING:
+    from intelligence.ollama_client import OllamaHost
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +54,13 @@ class VRAMTimeoutConfig:
 
 REDIS_STATE_KEY = "talos:vram:state"
 REDIS_MODEL_KEY = "talos:vram:loaded_model"
+VRAM_SCHEDULER_MAX_WAIT = float(os.getenv("VRAM_SCHEDULER_MAX_WAIT", "10"))
+# Concurrent holders of the same resident model; match OLLAMA_NUM_PARALLEL.
+VRAM_MAX_CONCURRENT = max(1, int(os.getenv("VRAM_MAX_CONCURRENT", "2")))
+
+
+class VRAMBusy(Exception):
+    """acquire(wait=False) found the slot taken or contended."""
 
 
 class VRAMMutex:
@@ -49,11 +72,23 @@ class VRAMMutex:
             await ollama.generate(model="qwen-coder", ...)
     """
 
-    def __init__(self) -> None:
-        self._semaphore = asyncio.Semaphore(1)
+    def __init__(self, host: Optional["OllamaHost"] = None) -> None:
+        # host=None means the default (first) Ollama host and the legacy Redis keys.
+        self.host = host
+        self._redis_prefix = f"talos:vram:{host.name}:" if host is not None else None
+        self._holders = 0
+        self._holder_model: Optional[str] = None
+        self._peak_holders = 0
+        self._swap_lock = asyncio.Lock()
+        self._waiters: dict[str, deque[tuple[asyncio.Future, float]]] = {}
         self._state = VRAMState.IDLE
         self._loaded_model: Optional[str] = None  # "coder" | "vl" | None
         self._lock = asyncio.Lock()
+        self._grants = 0
+        self._swaps = 0
+        self._aged_grants = 0
+        self._reconciled = 0  # corrections made from /api/ps
+        self._idle_since: Optional[float] = time.monotonic()  # None while held
 
     @property
     def state(self) -> VRAMState:
@@ -63,6 +98,11 @@ class VRAMMutex:
     def loaded_model(self) -> Optional[str]:
         return self._loaded_model
 
+    @property
+    def holder_model(self) -> Optional[str]:
+        """Model type of the current holder(s); may differ from loaded_model mid-swap."""
+        return self._holder_model
+
     async def _set_state(self, state: VRAMState, model: Optional[str] = None) -> None:
         async with self._lock:
             self._state = state
@@ -72,14 +112,189 @@ class VRAMMutex:
     async def _persist_state(self) -> None:
         try:
             from memory.redis_client import set_value
-            await set_value(REDIS_STATE_KEY, self._state.name)
-            await set_value(REDIS_MODEL_KEY, self._loaded_model or "none")
+            state_key, model_key = REDIS_STATE_KEY, REDIS_MODEL_KEY
+            if self._redis_prefix:
+                state_key = self._redis_prefix + "state"
+                model_key = self._redis_prefix + "loaded_model"
+            await set_value(state_key, self._state.name)
+            await set_value(model_key, self._loaded_model or "none")
         except Exception as exc:
             logger.warning("Failed to persist VRAM state to Redis: %s", exc)
 
-    def acquire(self, model_type: str) -> "_VRAMContext":
-        """Return an async context manager for exclusive VRAM access."""
-        return _VRAMContext(self, model_type)
+    async def reconcile(self) -> Optional[str]:
+        """
+        Align loaded_model (and the Redis keys) with what Ollama reports in
+        /api/ps, e.g. a model still resident from before a backend restart,
+        or one Ollama expired after keep_alive. Skipped while the slot is
+        held or a load/swap is in progress. Returns the resident model type.
+        """
+        from intelligence.ollama_client import (
+            QWEN_CODER_MODEL, QWEN_VL_MODEL, running_models, unload_model,
+        )
+        if self._holders or self._swap_lock.locked():
+            return self._loaded_model
+        try:
+            names = await running_models(self.host)
+        except Exception as exc:
+            logger.debug("VRAM reconcile skipped — /api/ps failed: %s", exc)
+            return self._loaded_model
+        if self._holders or self._swap_lock.locked() or self._state not in (VRAMState.IDLE, VRAMState.ERROR):
+            return self._loaded_model  # a request got in while we were asking
+
+        resident = [
+            model_type
+            for model_type, model in (("coder", QWEN_CODER_MODEL), ("vl", QWEN_VL_MODEL))
+            if model in names or f"{model}:latest" in names
+        ]
+        actual = resident[0] if len(resident) == 1 else None
+        if len(resident) > 1:
+            logger.warning("VRAM reconcile: both Qwen models resident — unloading to restore exclusivity")
+            async with self._swap_lock:
+                await unload_model(host=self.host)
+
+        if actual != self._loaded_model or self._state != VRAMState.IDLE:
+            self._reconciled += 1
+            logger.info(
+                "VRAM reconcile%s: %s/%s → IDLE/%s",
+                f" ({self.host.name})" if self.host else "",
+                self._state.name, self._loaded_model, actual,
+            )
+        await self._set_state(VRAMState.IDLE, model=actual)
+        return actual
+
+    def acquire(self, model_type: str, wait: bool = True) -> "_VRAMContext":
+        """Return an async context manager for exclusive VRAM access.
+
+        With wait=False, entering raises VRAMBusy instead of queueing when
+        the slot cannot be granted at once.
+        """
+        return _VRAMContext(self, model_type, wait)
+
+    # ── Scheduler ────────────────────────────────────────────────────────────
+
+    def _draining(self) -> bool:
+        """A waiter for another model has aged out — stop admitting joiners."""
+        now = time.monotonic()
+        for model_type, queue in self._waiters.items():
+            if model_type == self._holder_model:
+                continue
+            for fut, queued_at in queue:
+                if not fut.done() and now - queued_at >= VRAM_SCHEDULER_MAX_WAIT:
+                    return True
+        return False
+
+    def _can_join(self, model_type: str) -> bool:
+        return (
+            self._holders > 0
+            and self._holder_model == model_type
+            and self._holders < VRAM_MAX_CONCURRENT
+            and not self._draining()
+        )
+
+    def _try_grant(self, model_type: str) -> bool:
+        queued_same = self._waiters.get(model_type)
+        if not queued_same and (
+            (self._holders == 0 and not any(self._waiters.values()))
+            or self._can_join(model_type)
+        ):
+            self._grant(model_type)
+            return True
+        return False
+
+    async def _acquire_slot(self, model_type: str, timeout: float) -> None:
+        if self._try_grant(model_type):
+            return
+
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        waiter = (fut, time.monotonic())
+        queue = self._waiters.setdefault(model_type, deque())
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(fut, timeout=timeout)
+        except BaseException:
+            if fut.done() and not fut.cancelled():
+                self._release_slot()  # granted just as we gave up
+            else:
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+            raise
+
+    def _grant(self, model_type: str) -> None:
+        self._idle_since = None
+        self._holders += 1
+        self._holder_model = model_type
+        self._grants += 1
+        self._peak_holders = max(self._peak_holders, self._holders)
+
+    def _release_slot(self) -> None:
+        self._holders -= 1
+        if self._holders == 0:
+            self._holder_model = None
+            self._idle_since = time.monotonic()
+        self._grant_next()
+
+    def _grant_next(self) -> None:
+        while True:
+            if self._holders == 0:
+                model_type = self._pick_next()
+            elif self._can_join(self._holder_model):  # type: ignore[arg-type]
+                model_type = self._holder_model
+            else:
+                return
+            queue = self._waiters.get(model_type) if model_type else None
+            if not queue:
+                return
+            fut, _ = queue.popleft()
+            if fut.done():
+                continue  # timed out or cancelled while queued
+            self._grant(model_type)  # type: ignore[arg-type]
+            fut.set_result(None)
+
+    def _pick_next(self) -> Optional[str]:
+        heads = {}
+        for model_type, queue in self._waiters.items():
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if queue:
+                heads[model_type] = queue[0][1]
+        if not heads:
+            return None
+        oldest = min(heads, key=heads.__getitem__)
+        if time.monotonic() - heads[oldest] >= VRAM_SCHEDULER_MAX_WAIT:
+            if oldest != self._loaded_model and self._loaded_model in heads:
+                self._aged_grants += 1
+            return oldest
+        if self._loaded_model in heads:
+            return self._loaded_model
+        return oldest
+
+    def idle_for(self) -> float:
+        """Seconds since the last holder released the slot (0 while held)."""
+        return 0.0 if self._idle_since is None else time.monotonic() - self._idle_since
+
+    @property
+    def load(self) -> int:
+        """Current holders plus queued waiters — used for least-loaded host selection."""
+        return self._holders + sum(
+            1 for q in self._waiters.values() for fut, _ in q if not fut.done()
+        )
+
+    def stats(self) -> dict:
+        return {
+            "holders": self._holders,
+            "holder_model": self._holder_model,
+            "max_concurrent": VRAM_MAX_CONCURRENT,
+            "peak_holders": self._peak_holders,
+            "queue_depth": {m: len(q) for m, q in self._waiters.items()},
+            "grants": self._grants,
+            "swaps": self._swaps,
+            "swap_rate": round(self._swaps / self._grants, 3) if self._grants else 0.0,
+            "aged_grants": self._aged_grants,
+            "reconciled": self._reconciled,
+            "vram_used_mb": self._get_vram_used_mb(),
+        }
 
     async def _request_load(self, model_type: str) -> None:
         loading_state = VRAMState.LOADING_CODER if model_type == "coder" else VRAMState.LOADING_VL
@@ -103,51 +318,61 @@ class VRAMMutex:
         logger.critical("VRAM: ERROR state — %s", reason)
 
     def _get_vram_used_mb(self) -> Optional[float]:
-        """Query nvidia-smi for current VRAM usage."""
-        try:
-            result = subprocess.run(
-                ["nvidia-smi", "--query-gpu=memory.used", "--format=csv,noheader,nounits"],
-                capture_output=True, text=True,
-                timeout=VRAMTimeoutConfig.NVIDIA_SMI_TIMEOUT,
-            )
-            if result.returncode == 0:
-                return float(result.stdout.strip())
-        except (subprocess.TimeoutExpired, FileNotFoundError, ValueError):
-            pass
-        return None
+        """Latest VRAM reading from the telemetry sampler (local GPU only)."""
+        if self.host is not None:
+            return None
+        from intelligence.gpu_telemetry import gpu_telemetry
+        sample = gpu_telemetry.latest()
+        return sample.vram_used_mb if sample else None
 
 
 class _VRAMContext:
     """Async context manager returned by VRAMMutex.acquire()."""
 
-    def __init__(self, mutex: VRAMMutex, model_type: str) -> None:
+    def __init__(self, mutex: VRAMMutex, model_type: str, wait: bool = True) -> None:
         self._mutex = mutex
         self._model_type = model_type
+        self._wait = wait
 
     async def __aenter__(self):
+        if not self._wait:
+            if not self._mutex._try_grant(self._model_type):
+                raise VRAMBusy(f"VRAM slot busy ({self._mutex.load} holding or queued)")
+            return await self._swap_in()
         try:
-            await asyncio.wait_for(
-                self._mutex._semaphore.acquire(),
-                timeout=VRAMTimeoutConfig.SEMAPHORE_ACQUIRE_TIMEOUT,
-            )
+            with tracer.span("vram.acquire", model=self._model_type):
+                await self._mutex._acquire_slot(
+                    self._model_type,
+                    timeout=VRAMTimeoutConfig.SEMAPHORE_ACQUIRE_TIMEOUT,
+                )
         except asyncio.TimeoutError:
             raise TimeoutError(
                 f"VRAM semaphore acquire timed out after "
                 f"{VRAMTimeoutConfig.SEMAPHORE_ACQUIRE_TIMEOUT}s"
             )
+        return await self._swap_in()
 
-        # If a different model is loaded, unload it first
-        if (
-            self._mutex.loaded_model is not None
-            and self._mutex.loaded_model != self._model_type
-        ):
-            await self._unload_current()
-
-        await self._load_requested()
+    async def _swap_in(self):
+        try:
+            # Concurrent holders of the same model: the first one does the
+            # load, the rest wait here and then find it already resident.
+            async with self._mutex._swap_lock:
+                # If a different model is loaded, unload it first
+                if (
+                    self._mutex.loaded_model is not None
+                    and self._mutex.loaded_model != self._model_type
+                ):
+                    self._mutex._swaps += 1
+                    await self._unload_current()
+
+                await self._load_requested()
+        except BaseException:
+            self._mutex._release_slot()
+            raise
         return self._mutex
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        self._mutex._semaphore.release()
+        self._mutex._release_slot()
         # Don't unload on exit — keep model warm for reuse
 
     async def _load_requested(self) -> None:
@@ -156,10 +381,11 @@ class _VRAMContext:
 
         await self._mutex._request_load(self._model_type)
         try:
-            await asyncio.wait_for(
-                self._do_load(),
-                timeout=VRAMTimeoutConfig.MODEL_LOAD_TIMEOUT,
-            )
+            with tracer.span("vram.load", model=self._model_type):
+                await asyncio.wait_for(
+                    self._do_load(),
+                    timeout=VRAMTimeoutConfig.MODEL_LOAD_TIMEOUT,
+                )
             await self._mutex._complete_load(self._model_type)
         except asyncio.TimeoutError:
             await self._mutex._request_unload()
@@ -171,17 +397,18 @@ class _VRAMContext:
 
     async def _do_load(self) -> None:
         """Trigger Ollama to load the model into VRAM."""
-        from intelligence.ollama_client import pull_model_to_vram
-        model_name = "qwen2.5-coder:7b" if self._model_type == "coder" else "qwen2.5vl:7b"
-        await pull_model_to_vram(model_name)
+        from intelligence.ollama_client import pull_model_to_vram, QWEN_CODER_MODEL, QWEN_VL_MODEL
+        model_name = QWEN_CODER_MODEL if self._model_type == "coder" else QWEN_VL_MODEL
+        await pull_model_to_vram(model_name, host=self._mutex.host)
 
     async def _unload_current(self) -> None:
         await self._mutex._request_unload()
         try:
-            await asyncio.wait_for(
-                self._force_unload(),
-                timeout=VRAMTimeoutConfig.MODEL_UNLOAD_TIMEOUT,
-            )
+            with tracer.span("vram.unload", model=self._mutex.loaded_model):
+                await asyncio.wait_for(
+                    self._force_unload(),
+                    timeout=VRAMTimeoutConfig.MODEL_UNLOAD_TIMEOUT,
+                )
             await self._mutex._complete_unload()
         except asyncio.TimeoutError:
             logger.critical("VRAM unload hung at 29s — force-killing Ollama process")
@@ -190,9 +417,12 @@ class _VRAMContext:
 
     async def _force_unload(self) -> None:
         from intelligence.ollama_client import unload_model
-        await unload_model()
+        await unload_model(host=self._mutex.host)
 
     async def _kill_ollama(self) -> None:
+        if self._mutex.host is not None:
+            logger.critical("Cannot kill Ollama on remote host %s — restart it manually", self._mutex.host.name)
+            return
         try:
             result = subprocess.run(["pkill", "-SIGTERM", "ollama"], timeout=5)
             await asyncio.sleep(VRAMTimeoutConfig.PROCESS_KILL_TIMEOUT)
@@ -202,5 +432,6 @@ class _VRAMContext:
             logger.error("Failed to kill Ollama: %s", exc)
 
 
-# Module-level singleton
+# Module-level singleton — the default (first) Ollama host's slot.
+# Additional hosts get their own VRAMMutex in intelligence.ollama_pool.
 vram_mutex = VRAMMutex()
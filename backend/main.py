@@ -4,14 +4,20 @@ Endpoints:
   GET  /health              Service status
   GET  /metrics             VRAM state, token counts, skill counts
   POST /chat                Send message, get response
+  POST /chat/stream         Send message, stream response tokens (NDJSON)
+  POST /chat/batch          Send many messages, get per-item results in order
+  POST /jobs                Submit message as a background job, get job id
+  GET  /jobs/{id}           Job status/result (?wait=N to long-poll)
   POST /skills/{id}/promote TTS-protected promotion
   DELETE /skills/{id}       Manual deprecation
+  POST /admin/traces/dump   Write recent pipeline traces to Tier-3 JSON-L
   WS   /ws/logs             Live log streaming
 
 Basic Auth protects all endpoints.
 """
 import asyncio
 import base64
+import json
 import logging
 import os
 import secrets
@@ -21,7 +27,7 @@ from typing import Optional
 
 from fastapi import Depends, FastAPI, HTTPException, WebSocket, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -31,6 +37,8 @@ logger = logging.getLogger(__name__)
 BASIC_AUTH_USER = os.getenv("BASIC_AUTH_USER", "admin")
 BASIC_AUTH_PASS = os.getenv("BASIC_AUTH_PASS", "")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+JOB_MAX_WAIT = 60.0  # long-poll cap for GET /jobs/{id}
 
 logging.basicConfig(
     level=getattr(logging, LOG_LEVEL, logging.INFO),
@@ -68,6 +76,18 @@ async def lifespan(app: FastAPI):
 
     await init_collections()
 
+    # Start micro-batching embedding service (encode runs off the event loop)
+    from memory.embedding_service import embedding_service
+    embedding_service.start()
+
+    # Start batched conversation-turn writer
+    from memory.turn_writer import turn_writer
+    turn_writer.start()
+
+    # Start background job workers (resumes jobs left unfinished by a restart)
+    from orchestrator.jobs import job_manager
+    await job_manager.start()
+
     # Start watchdog
     from orchestrator.watchdog import watchdog, heartbeat_task
     watchdog.start()
@@ -81,10 +101,30 @@ async def lifespan(app: FastAPI):
     from maintenance.dream_cycle import start_scheduler
     start_scheduler()
 
+    # Start model-endpoint health monitor (first probe runs before we continue)
+    from intelligence.endpoint_monitor import endpoint_monitor
+    await endpoint_monitor.start()
+
+    # Start GPU telemetry sampler
+    from intelligence.gpu_telemetry import gpu_telemetry
+    gpu_telemetry.start()
+
+    # Load the prompt-sizing tokenizer off the event loop
+    from intelligence.token_budget import warm as warm_tokenizer
+    asyncio.create_task(warm_tokenizer())
+
+    # Adopt models Ollama already has in VRAM, then keep the mutexes in sync
+    from intelligence.ollama_pool import ollama_pool
+    await ollama_pool.start()
+
+    # Start predictive pre-warming (learns the per-hour model mix)
+    from intelligence.prewarm import warm_policy
+    await warm_policy.start()
+
     # Optional: pull Ollama models in background
-    from intelligence.ollama_client import ensure_models_pulled, is_available
-    if await is_available():
-        asyncio.create_task(ensure_models_pulled())
+    from intelligence.ollama_client import ensure_models_pulled
+    for member in ollama_pool.healthy():
+        asyncio.create_task(ensure_models_pulled(member.host))
 
     # Optional: auto-open dashboard
     if os.getenv("DASHBOARD_AUTO_OPEN", "true").lower() == "true":
@@ -97,6 +137,27 @@ async def lifespan(app: FastAPI):
     from comms.websocket import log_streamer
     log_streamer.stop()
 
+    from orchestrator.jobs import job_manager
+    await job_manager.stop()
+
+    from intelligence.endpoint_monitor import endpoint_monitor
+    endpoint_monitor.stop()
+
+    from intelligence.gpu_telemetry import gpu_telemetry
+    gpu_telemetry.stop()
+
+    from intelligence.ollama_pool import ollama_pool
+    ollama_pool.stop()
+
+    from intelligence.prewarm import warm_policy
+    await warm_policy.stop()
+
+    from memory.turn_writer import turn_writer
+    await turn_writer.close()
+
+    from memory.embedding_service import embedding_service
+    await embedding_service.close()
+
 
 app = FastAPI(title="Talos v4.0", version="4.0.0", lifespan=lifespan)
 
@@ -120,6 +181,21 @@ class ChatRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
     force_cloud: bool = False
+    temperature: Optional[float] = None
+    use_cache: bool = True
+
+
+class BatchChatItem(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+    images: Optional[list[str]] = None
+    force_cloud: bool = False
+
+
+class BatchChatRequest(BaseModel):
+    items: list[BatchChatItem]
+    temperature: Optional[float] = None
+    use_cache: bool = True
 
 
 class PromoteRequest(BaseModel):
@@ -141,11 +217,11 @@ async def root():
 async def health():
     from memory.redis_client import ping as redis_ping
     from memory.chroma_client import ping as chroma_ping
-    from intelligence.ollama_client import is_available as ollama_ok
+    from intelligence.endpoint_monitor import endpoint_monitor
 
     r_ok = await redis_ping()
     c_ok = await chroma_ping()
-    o_ok = await ollama_ok()
+    o_ok = endpoint_monitor.is_available("ollama")
 
     all_ok = r_ok and c_ok
     return {
@@ -159,12 +235,28 @@ async def health():
 @app.get("/metrics", dependencies=[Depends(require_auth)])
 async def metrics():
     from intelligence.vram_mutex import vram_mutex
-    from intelligence.gemini_client import get_status as gemini_status
+    from intelligence.gemini_client import get_status as gemini_status, refresh_state as refresh_gemini_state
     from skills.registry import list_skills
     from memory.chroma_client import get_total_vector_count
     from memory.redis_client import get_client
+    from orchestrator.tracing import tracer
+    from memory.turn_writer import turn_writer
+    from memory.embedding_service import embedding_service
+    from memory.embedding_cache import embedding_cache
+    from intelligence.response_cache import response_cache
+    from intelligence.semantic_cache import semantic_cache
+    from intelligence.singleflight import singleflight
+    from orchestrator.jobs import job_manager
+    from intelligence.endpoint_monitor import endpoint_monitor
+    from intelligence.ollama_pool import ollama_pool
+    from intelligence import token_budget
+    from intelligence.gpu_telemetry import gpu_telemetry
+    from intelligence.prewarm import warm_policy
+    from intelligence.kv_context import kv_context
+    from intelligence.hedging import hedger
     import psutil
 
+    await refresh_gemini_state()
     gemini = gemini_status()
 
     try:
@@ -182,11 +274,27 @@ async def metrics():
         "vram": {
             "state": vram_mutex.state.name,
             "loaded_model": vram_mutex.loaded_model,
+            "scheduler": vram_mutex.stats(),
+            "hosts": ollama_pool.stats(),
+            "prewarm": warm_policy.stats(),
         },
+        "gpu": gpu_telemetry.stats(),
         "gemini": gemini,
+        "endpoints": endpoint_monitor.snapshot(),
         "redis_mem_mb": redis_mem_mb,
         "total_vectors": total_vectors,
         "skills": {"active": active_skills, "quarantine": quarantine_skills},
+        "latency_ms": tracer.histograms(),
+        "turn_writer": turn_writer.stats(),
+        "embedding": embedding_service.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "singleflight": singleflight.stats(),
+        "kv_context": kv_context.stats(),
+        "hedging": hedger.stats(),
+        "token_budget": token_budget.stats(),
+        "jobs": job_manager.stats(),
         "system": {
             "cpu_percent": psutil.cpu_percent(),
             "mem_percent": psutil.virtual_memory().percent,
@@ -201,12 +309,78 @@ async def chat(req: ChatRequest):
         user_input=req.message,
         session_id=req.session_id,
         force_cloud=req.force_cloud,
+        temperature=req.temperature,
+        use_cache=req.use_cache,
     )
     if result.get("blocked"):
         raise HTTPException(status_code=403, detail=result.get("reason", "blocked"))
     return result
 
 
+@app.post("/chat/stream", dependencies=[Depends(require_auth)])
+async def chat_stream(req: ChatRequest):
+    """Stream the reply as newline-delimited JSON events (see process_message_stream)."""
+    from orchestrator.loop import process_message_stream
+    events = process_message_stream(
+        user_input=req.message,
+        session_id=req.session_id,
+        force_cloud=req.force_cloud,
+        temperature=req.temperature,
+        use_cache=req.use_cache,
+    )
+    # Pull the first event before committing to a 200 so blocked messages
+    # get the same 403 as /chat.
+    first = await events.__anext__()
+    if first["type"] == "blocked":
+        await events.aclose()
+        raise HTTPException(status_code=403, detail=first.get("reason", "blocked"))
+
+    async def _body():
+        yield json.dumps(first) + "\n"
+        async for event in events:
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(_body(), media_type="application/x-ndjson")
+
+
+@app.post("/chat/batch", dependencies=[Depends(require_auth)])
+async def chat_batch(req: BatchChatRequest):
+    from orchestrator.loop import process_batch
+    if len(req.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    results = await process_batch(
+        [item.model_dump() for item in req.items],
+        temperature=req.temperature,
+        use_cache=req.use_cache,
+    )
+    return {"count": len(results), "results": results}
+
+
+@app.post("/jobs", status_code=202, dependencies=[Depends(require_auth)])
+async def submit_job(req: ChatRequest):
+    from orchestrator.jobs import job_manager, JobQueueFull
+    try:
+        job = await job_manager.submit({
+            "user_input": req.message,
+            "session_id": req.session_id,
+            "force_cloud": req.force_cloud,
+            "temperature": req.temperature,
+            "use_cache": req.use_cache,
+        })
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    return {"job_id": job["job_id"], "status": job["status"]}
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(require_auth)])
+async def get_job(job_id: str, wait: float = 0.0):
+    from orchestrator.jobs import job_manager
+    job = await job_manager.wait(job_id, timeout=min(max(wait, 0.0), JOB_MAX_WAIT))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
 @app.post("/skills/{skill_id}/promote", dependencies=[Depends(require_auth)])
 async def promote_skill(skill_id: str, req: PromoteRequest, user: str = Depends(require_auth)):
     from skills.quarantine import promote
@@ -282,6 +456,21 @@ async def trigger_dream_cycle():
     return {"triggered": True, "message": "Dream cycle started in background"}
 
 
+@app.post("/admin/embedding/parity", dependencies=[Depends(require_auth)])
+async def embedding_parity():
+    """Compare the active embedding backend against the sentence-transformers reference."""
+    from memory.rag import parity_check
+    return await asyncio.to_thread(parity_check)
+
+
+@app.post("/admin/traces/dump", dependencies=[Depends(require_auth)])
+async def dump_traces():
+    """Append recent per-stage pipeline traces to the Tier-3 trace log."""
+    from orchestrator.tracing import tracer, TRACE_DUMP_FILE
+    written = await asyncio.to_thread(tracer.dump_jsonl)
+    return {"traces_written": written, "path": str(TRACE_DUMP_FILE)}
+
+
 @app.websocket("/ws/logs")
 async def ws_logs(websocket: WebSocket):
     from comms.websocket import connect, disconnect
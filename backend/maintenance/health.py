@@ -1,7 +1,7 @@
 """Health checks and system metrics collection.
 
 Spec § 4.3 / § 4.5: CPU%, memory%, Redis usage, ChromaDB vector count,
-Ollama availability, Gemini quota. Exposed via GET /metrics.
+Ollama availability, Gemini quota, GPU telemetry. Exposed via GET /metrics.
 """
 import logging
 import os
@@ -18,7 +18,7 @@ async def collect() -> dict:
     redis_ok, redis_mem_mb = await _redis_health()
     chroma_ok, vector_count = await _chroma_health()
     ollama_ok = await _ollama_health()
-    gemini_status = _gemini_status()
+    gemini_status = await _gemini_status()
 
     return {
         "system": {
@@ -43,6 +43,8 @@ async def collect() -> dict:
             "percent": round(vector_count / 100000 * 100, 1) if vector_count >= 0 else -1,
         },
         "ollama": {"ok": ollama_ok},
+        "gpu": _gpu_stats(),
+        "endpoints": _endpoint_snapshot(),
         "gemini": gemini_status,
     }
 
@@ -75,15 +77,32 @@ async def _chroma_health() -> tuple[bool, int]:
 
 async def _ollama_health() -> bool:
     try:
-        from intelligence.ollama_client import is_available
-        return await is_available()
+        from intelligence.endpoint_monitor import endpoint_monitor
+        return endpoint_monitor.is_available("ollama")
     except Exception:
         return False
 
 
-def _gemini_status() -> dict:
+def _endpoint_snapshot() -> dict:
     try:
-        from intelligence.gemini_client import get_status
+        from intelligence.endpoint_monitor import endpoint_monitor
+        return endpoint_monitor.snapshot()
+    except Exception:
+        return {}
+
+
+def _gpu_stats() -> dict:
+    try:
+        from intelligence.gpu_telemetry import gpu_telemetry
+        return gpu_telemetry.stats()
+    except Exception:
+        return {}
+
+
+async def _gemini_status() -> dict:
+    try:
+        from intelligence.gemini_client import get_status, refresh_state
+        await refresh_state()  # this worker's copy of the shared breaker/quota state
         return get_status()
     except Exception:
         return {"available": False}
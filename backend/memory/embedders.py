@@ -0,0 +1,229 @@
+"""Embedding backends for rag.encode().
+
+EMBEDDING_BACKEND selects one:
+  sentence-transformers  SentenceTransformer on PyTorch, the reference
+  onnx                   the model's ONNX export on ONNX Runtime (CPU), tokenised
+                         with `tokenizers`; torch is never imported
+  onnx-int8              the same, using the int8 dynamically quantised export
+Extra backends can be added with register_backend().
+
+The ONNX files are the ones sentence-transformers publishes next to the
+model on the Hugging Face Hub (onnx/model.onnx and
+onnx/model_quint8_avx2.onnx). EMBEDDING_ONNX_FILE and
+EMBEDDING_ONNX_INT8_FILE point at other exports. The ONNX path reproduces
+SentenceTransformer's mean pooling over the attention mask followed by L2
+normalisation, the setup used by MiniLM and most sentence-transformers
+models. Sequences are truncated at the model's max_seq_length.
+
+Every backend records its load time and encode throughput. parity_check()
+embeds a fixed sample with the active backend and with the reference and
+reports the cosine drift between them. The reference model is loaded once
+per model name and kept for later checks.
+"""
+import abc
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+EMBEDDING_ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # 0 = ONNX Runtime default
+EMBEDDING_PARITY_MIN_COSINE = float(os.getenv("EMBEDDING_PARITY_MIN_COSINE", "0.99"))
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+PARITY_TEXTS = [
+    "What's the weather like in Berlin tomorrow?",
+    "Refactor this function to use a context manager instead of try/finally.",
+    "User: remind me to call the dentist\nAssistant: Reminder set for 9am.",
+    "def fib(n):\n    return n if n < 2 else fib(n - 1) + fib(n - 2)",
+    "The VRAM mutex serialises model swaps between the coder and vision models.",
+    "Résumé, naïve café — accents and ünïcödé should survive tokenisation.",
+    "ok",
+    "A much longer passage about memory retrieval: " + "scores combine recency, frequency and priority. " * 20,
+]
+
+
+class Embedder(abc.ABC):
+    """A loaded embedding model. encode() returns L2-normalised vectors and is called from worker threads."""
+
+    name = "base"
+
+    def __init__(self, model: str) -> None:
+        self.model = model
+        self.load_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._calls = 0
+        self._encode_seconds = 0.0
+
+    def load(self) -> None:
+        start = time.perf_counter()
+        self._load()
+        self.load_seconds = time.perf_counter() - start
+        logger.info("Loaded embedding model %s (%s) in %.2fs", self.model, self.name, self.load_seconds)
+
+    def encode(self, texts: list[str]) -> list[list[float]]:
+        start = time.perf_counter()
+        vectors = self._encode(texts)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._texts += len(texts)
+            self._calls += 1
+            self._encode_seconds += elapsed
+        return vectors
+
+    @abc.abstractmethod
+    def _load(self) -> None:
+        ...
+
+    @abc.abstractmethod
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        ...
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "model": self.model,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "calls": self._calls,
+            "texts": self._texts,
+            "encode_seconds": round(self._encode_seconds, 3),
+            "texts_per_sec": round(self._texts / self._encode_seconds, 1) if self._encode_seconds else None,
+        }
+
+
+class SentenceTransformerEmbedder(Embedder):
+    name = "sentence-transformers"
+
+    def _load(self) -> None:
+        from sentence_transformers import SentenceTransformer
+        self._model = SentenceTransformer(self.model)
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        return self._model.encode(texts, normalize_embeddings=True).tolist()
+
+
+class OnnxEmbedder(Embedder):
+    name = "onnx"
+    onnx_file = EMBEDDING_ONNX_FILE
+
+    def _load(self) -> None:
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        self._tokenizer = Tokenizer.from_file(hf_hub_download(self.model, "tokenizer.json"))
+        self._tokenizer.enable_truncation(self._max_seq_length(hf_hub_download))
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        if EMBEDDING_ONNX_THREADS:
+            options.intra_op_num_threads = EMBEDDING_ONNX_THREADS
+        self._session = ort.InferenceSession(
+            hf_hub_download(self.model, self.onnx_file), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self._session.get_inputs()}
+
+    def _max_seq_length(self, download: Callable[..., str]) -> int:
+        try:
+            with open(download(self.model, "sentence_bert_config.json")) as f:
+                return int(json.load(f)["max_seq_length"])
+        except Exception:
+            return DEFAULT_MAX_SEQ_LENGTH
+
+    def _encode(self, texts: list[str]) -> list[list[float]]:
+        import numpy as np
+
+        encodings = self._tokenizer.encode_batch(texts)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self._session.run(None, {k: v for k, v in feed.items() if k in self._input_names})[0]
+
+        weights = mask[..., None].astype(np.float32)
+        pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+class QuantizedOnnxEmbedder(OnnxEmbedder):
+    name = "onnx-int8"
+    onnx_file = EMBEDDING_ONNX_INT8_FILE
+
+
+REFERENCE_BACKEND = SentenceTransformerEmbedder.name
+
+BACKENDS: dict[str, Callable[[str], Embedder]] = {
+    SentenceTransformerEmbedder.name: SentenceTransformerEmbedder,
+    OnnxEmbedder.name: OnnxEmbedder,
+    QuantizedOnnxEmbedder.name: QuantizedOnnxEmbedder,
+}
+
+
+_references: dict[str, Embedder] = {}
+_references_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[str], Embedder]) -> None:
+    BACKENDS[name] = factory
+
+
+def make_embedder(name: str, model: str) -> Embedder:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND {name!r} (expected one of {sorted(BACKENDS)})")
+    return BACKENDS[name](model)
+
+
+def parity_check(embedder: Embedder, texts: Optional[list[str]] = None) -> dict:
+    """Cosine similarity between `embedder` and the reference backend on the same texts."""
+    texts = texts or PARITY_TEXTS
+    if embedder.name == REFERENCE_BACKEND:
+        reference = embedder
+    else:
+        reference = _reference_for(embedder.model)
+
+    start = time.perf_counter()
+    candidate = embedder.encode(texts)
+    candidate_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = reference.encode(texts)
+    reference_seconds = time.perf_counter() - start
+
+    cosines = [sum(a * b for a, b in zip(u, v)) for u, v in zip(candidate, expected)]  # both normalised
+    return {
+        "backend": embedder.name,
+        "reference": reference.name,
+        "model": embedder.model,
+        "texts": len(texts),
+        "mean_cosine": round(sum(cosines) / len(cosines), 5),
+        "min_cosine": round(min(cosines), 5),
+        "max_drift": round(1.0 - min(cosines), 5),
+        "ok": min(cosines) >= EMBEDDING_PARITY_MIN_COSINE,
+        "texts_per_sec": {
+            embedder.name: round(len(texts) / candidate_seconds, 1),
+            f"{reference.name} (reference)": round(len(texts) / reference_seconds, 1),
+        },
+        "load_seconds": {
+            e.name: round(e.load_seconds, 3) if e.load_seconds is not None else None
+            for e in (embedder, reference)
+        },
+    }
+
+
+def _reference_for(model: str) -> Embedder:
+    """The reference embedder for `model`, loaded on first use and reused after."""
+    with _references_lock:
+        reference = _references.get(model)
+        if reference is None:
+            reference = make_embedder(REFERENCE_BACKEND, model)
+            reference.load()
+            _references[model] = reference
+        return reference
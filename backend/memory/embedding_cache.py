@@ -0,0 +1,214 @@
+"""Two-level embedding cache in front of rag.embed.
+
+Level 1 is an in-process LRU of EMBED_CACHE_LRU_SIZE vectors, each held as
+a float32 array (4 bytes per dimension rather than a boxed Python float in a
+list) and converted back to a list on the way out. Level 2 is
+Redis, shared by workers and kept across restarts: one key per text,
+talos:embed:<model tag>:<sha256 of text>, holding the vector packed as
+EMBED_CACHE_DTYPE (float16 by default, half the size of float32) and
+base64-encoded, since the client decodes responses as text. A sorted-set
+index per model tag, scored by insert time, caps Redis at
+EMBED_CACHE_MAX_ENTRIES by evicting the oldest entries, and every entry
+also expires after EMBED_CACHE_TTL.
+
+The model tag is a hash of the embedding model's identity (rag.embedder_id:
+EMBEDDING_MODEL, plus EMBEDDING_BACKEND unless it is the reference), so
+vectors from one model are never served for another. The first lookup
+compares the identity with the one recorded in talos:embed:model. If the
+model or backend has changed, it deletes the previous entries.
+"""
+import base64
+import hashlib
+import logging
+import os
+import struct
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+EMBED_CACHE_ENABLED = os.getenv("EMBED_CACHE_ENABLED", "true").lower() == "true"
+EMBED_CACHE_LRU_SIZE = int(os.getenv("EMBED_CACHE_LRU_SIZE", "4096"))
+# ~1.3 KB of Redis per entry for a 384-dim float16 vector (1 KB base64 value,
+# key, index member and overhead): 30k entries ≈ 40 MB of the 512 MB instance,
+# which is shared with locks, jobs, Gemini state and session windows under
+# allkeys-lru.
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "30000"))
+EMBED_CACHE_TTL = int(os.getenv("EMBED_CACHE_TTL", str(7 * 86400)))
+EMBED_CACHE_DTYPE = os.getenv("EMBED_CACHE_DTYPE", "float16")
+
+REDIS_KEY_PREFIX = "talos:embed:"
+REDIS_INDEX_PREFIX = "talos:embed:index:"
+REDIS_MODEL_KEY = "talos:embed:model"
+_PURGE_CHUNK = 500
+_STRUCT_CODES = {"float16": "e", "float32": "f"}
+
+
+def _model_tag(model: str) -> str:
+    return hashlib.sha256(model.encode()).hexdigest()[:12]
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(
+        self,
+        lru_size: int = EMBED_CACHE_LRU_SIZE,
+        max_entries: int = EMBED_CACHE_MAX_ENTRIES,
+        dtype: str = EMBED_CACHE_DTYPE,
+    ) -> None:
+        self._lru: OrderedDict[str, array] = OrderedDict()
+        self._lru_size = lru_size
+        self._max_entries = max_entries
+        self._dtype = dtype
+        self._code = _STRUCT_CODES[dtype]
+        self._model: Optional[str] = None
+        self._tag = ""
+        self.lru_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return EMBED_CACHE_ENABLED
+
+    # ── Lookup / store ───────────────────────────────────────────────────────
+
+    async def get_many(self, texts: list[str]) -> list[Optional[list[float]]]:
+        """Cached vector for each text, or None where it has to be computed."""
+        if not self.enabled:
+            return [None] * len(texts)
+        await self._sync_model()
+        found: list[Optional[list[float]]] = [None] * len(texts)
+        remote: dict[str, list[int]] = {}  # redis key -> positions in `texts`
+        for i, text in enumerate(texts):
+            key = self._key(text)
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                found[i] = vector.tolist()
+                self.lru_hits += 1
+            else:
+                remote.setdefault(key, []).append(i)
+
+        if remote:
+            try:
+                from memory.redis_client import get_client
+                r = await get_client()
+                packed = await r.mget(list(remote))
+            except Exception as exc:
+                logger.debug("Embedding cache read failed: %s", exc)
+                packed = [None] * len(remote)
+            for (key, positions), raw in zip(remote.items(), packed):
+                if raw is None:
+                    self.misses += len(positions)
+                    continue
+                vector = self._unpack(raw)
+                self._remember(key, vector)
+                for i in positions:
+                    found[i] = vector
+                self.redis_hits += len(positions)
+        return found
+
+    async def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """Store text -> vector in both levels."""
+        if not self.enabled or not vectors:
+            return
+        entries = {self._key(text): vector for text, vector in vectors.items()}
+        for key, vector in entries.items():
+            self._remember(key, vector)
+        try:
+            from memory.redis_client import get_client
+            r = await get_client()
+            index = REDIS_INDEX_PREFIX + self._tag
+            now = time.time()
+            async with r.pipeline(transaction=False) as pipe:
+                for key, vector in entries.items():
+                    pipe.set(key, self._pack(vector), ex=EMBED_CACHE_TTL)
+                pipe.zadd(index, {key: now for key in entries})
+                pipe.zremrangebyscore(index, "-inf", now - EMBED_CACHE_TTL)
+                pipe.zcard(index)
+                *_, size = await pipe.execute()
+            self.stores += len(entries)
+
+            overflow = int(size) - self._max_entries
+            if overflow > 0:
+                evicted = await r.zpopmin(index, overflow)
+                if evicted:
+                    await r.delete(*(k for k, _ in evicted))
+                    self.evictions += len(evicted)
+        except Exception as exc:
+            logger.debug("Embedding cache write failed: %s", exc)
+
+    # ── Internals ────────────────────────────────────────────────────────────
+
+    def _key(self, text: str) -> str:
+        return f"{REDIS_KEY_PREFIX}{self._tag}:{_text_hash(text)}"
+
+    def _remember(self, key: str, vector: list[float]) -> None:
+        self._lru[key] = array("f", vector)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self._lru_size:
+            self._lru.popitem(last=False)
+
+    def _pack(self, vector: list[float]) -> str:
+        return base64.b64encode(struct.pack(f"<{len(vector)}{self._code}", *vector)).decode()
+
+    def _unpack(self, raw: str) -> list[float]:
+        data = base64.b64decode(raw)
+        return list(struct.unpack(f"<{len(data) // struct.calcsize(self._code)}{self._code}", data))
+
+    async def _sync_model(self) -> None:
+        """Namespace by the current model; drop the previous model's entries if it changed."""
+        from memory.rag import embedder_id
+        model = embedder_id()
+        if self._model == model:
+            return
+        self._model, self._tag = model, _model_tag(model)
+        self._lru.clear()
+        try:
+            from memory.redis_client import get_client
+            r = await get_client()
+            previous = await r.getset(REDIS_MODEL_KEY, model)
+            if previous is None or previous == model:
+                return
+            old_index = REDIS_INDEX_PREFIX + _model_tag(previous)
+            keys = await r.zrange(old_index, 0, -1)
+            for start in range(0, len(keys), _PURGE_CHUNK):
+                await r.delete(*keys[start:start + _PURGE_CHUNK])
+            await r.delete(old_index)
+            self.invalidations += 1
+            logger.info(
+                "Embedding model changed (%s → %s) — dropped %d cached vectors",
+                previous, model, len(keys),
+            )
+        except Exception as exc:
+            logger.warning("Embedding cache model check failed: %s", exc)
+
+    def stats(self) -> dict:
+        hits = self.lru_hits + self.redis_hits
+        lookups = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model": self._model,
+            "lru_size": len(self._lru),
+            "lru_hits": self.lru_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "dtype": self._dtype,
+        }
+
+
+# Module-level singleton
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,188 @@
+"""Micro-batching embedding service.
+
+SentenceTransformer.encode is CPU/GPU-bound and synchronous, so calling it
+from a coroutine blocks the event loop for the whole encode. Callers await
+embed() instead: each request is queued with a future, and one dispatcher
+task merges whatever arrives within EMBED_MAX_WAIT_MS (up to
+EMBED_MAX_BATCH texts) into a single encode call. That call runs on a
+thread pool of EMBED_WORKERS threads. Results are split back to the
+waiting futures in order.
+
+A thread pool rather than a process pool: the model stays loaded once,
+and torch releases the GIL while encoding. A request larger than
+EMBED_MAX_BATCH is encoded on its own rather than split.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from orchestrator.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+EMBED_MAX_WAIT = float(os.getenv("EMBED_MAX_WAIT_MS", "5")) / 1000
+EMBED_WORKERS = int(os.getenv("EMBED_WORKERS", "1"))
+
+
+@dataclass
+class _Request:
+    texts: list[str]
+    future: asyncio.Future
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingService:
+    def __init__(
+        self,
+        max_batch: int = EMBED_MAX_BATCH,
+        max_wait: float = EMBED_MAX_WAIT,
+        workers: int = EMBED_WORKERS,
+    ) -> None:
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._workers = workers
+        self._queue: asyncio.Queue[_Request] = asyncio.Queue()
+        self._carry: Optional[_Request] = None  # didn't fit in the previous batch
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batch_sizes: deque[int] = deque(maxlen=500)
+        self.requests = 0
+        self.texts = 0
+        self.batches = 0
+        self.errors = 0
+        self.peak_queue_depth = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="embed")
+            self._slots = asyncio.Semaphore(self._workers)
+            self._task = asyncio.create_task(self._run())
+            self._executor.submit(self._preload).add_done_callback(self._log_preload)
+            logger.info(
+                "Embedding service started (batch=%d, wait=%.0fms, workers=%d)",
+                self._max_batch, self._max_wait * 1000, self._workers,
+            )
+
+    @staticmethod
+    def _preload() -> None:
+        from memory.rag import get_embedder
+        get_embedder()
+
+    @staticmethod
+    def _log_preload(future) -> None:
+        if future.exception() is not None:
+            logger.error("Embedding model failed to load: %s", future.exception())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        pending = [self._carry] if self._carry else []
+        self._carry = None
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for request in pending:
+            if not request.future.done():
+                request.future.set_exception(RuntimeError("embedding service stopped"))
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def embed(self, texts: list[str]) -> list[list[float]]:
+        """L2-normalised embeddings for `texts`, batched with concurrent callers."""
+        if not texts:
+            return []
+        if self._task is None or self._task.done():
+            self.start()  # first use outside the app lifespan (scripts, maintenance jobs)
+        request = _Request(list(texts), asyncio.get_running_loop().create_future())
+        self._queue.put_nowait(request)
+        self.requests += 1
+        self.texts += len(texts)
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        return await request.future
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() + (1 if self._carry else 0)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            await self._slots.acquire()  # type: ignore[union-attr]
+            asyncio.create_task(self._encode(batch))
+
+    async def _next_batch(self) -> list[_Request]:
+        first, self._carry = self._carry or await self._queue.get(), None
+        batch, size = [first], len(first.texts)
+        deadline = first.queued_at + self._max_wait
+        while size < self._max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    request = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                else:
+                    request = self._queue.get_nowait()  # past the deadline: take only what's queued
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if size + len(request.texts) > self._max_batch:
+                self._carry = request
+                break
+            batch.append(request)
+            size += len(request.texts)
+        return batch
+
+    async def _encode(self, batch: list[_Request]) -> None:
+        from memory.rag import encode
+
+        texts = [t for request in batch for t in request.texts]
+        try:
+            with tracer.span("embed.encode", batch=len(texts)):
+                vectors = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, encode, texts
+                )
+        except Exception as exc:
+            self.errors += 1
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+            return
+        finally:
+            self._slots.release()  # type: ignore[union-attr]
+
+        self.batches += 1
+        self._batch_sizes.append(len(texts))
+        offset = 0
+        for request in batch:
+            end = offset + len(request.texts)
+            if not request.future.done():  # the caller may have been cancelled
+                request.future.set_result(vectors[offset:end])
+            offset = end
+
+    def stats(self) -> dict:
+        from memory.rag import embedder_stats
+        sizes = self._batch_sizes
+        return {
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "requests": self.requests,
+            "texts": self.texts,
+            "batches": self.batches,
+            "errors": self.errors,
+            "avg_batch": round(sum(sizes) / len(sizes), 1) if sizes else 0.0,
+            "max_batch_seen": max(sizes) if sizes else 0,
+            "max_batch": self._max_batch,
+            "max_wait_ms": self._max_wait * 1000,
+            "workers": self._workers,
+            "backend": embedder_stats(),
+        }
+
+
+# Module-level singleton
+embedding_service = EmbeddingService()
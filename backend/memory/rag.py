@@ -3,37 +3,76 @@
 Scoring formula (spec § 3.2):
     retention_score = recency * 0.3 + frequency * 0.3 + priority * 0.4
 """
+import asyncio
 import logging
 import os
+import threading
 import time
 from typing import Optional
 
-from sentence_transformers import SentenceTransformer
-
 from memory.chroma_client import query, enforce_vector_ceiling
+from memory.embedders import Embedder, REFERENCE_BACKEND, make_embedder
+from orchestrator.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", REFERENCE_BACKEND)  # see memory.embedders
 SIMILARITY_THRESHOLD = float(os.getenv("MEMORY_SIMILARITY_THRESHOLD", "0.75"))
 CONTEXT_TOP_N = int(os.getenv("MEMORY_CONTEXT_WINDOW", "10"))
 
-_embedder: Optional[SentenceTransformer] = None
+_embedder: Optional[Embedder] = None
+_embedder_lock = threading.Lock()  # encode runs on several worker threads
 
 PRIORITY_SCORES = {"critical": 1.0, "high": 0.8, "normal": 0.5, "temporary": 0.2}
 
 
-def get_embedder() -> SentenceTransformer:
+def get_embedder() -> Embedder:
     global _embedder
-    if _embedder is None:
-        logger.info("Loading embedding model: %s", EMBEDDING_MODEL)
-        _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    with _embedder_lock:
+        if _embedder is None:
+            logger.info("Loading embedding model: %s (backend=%s)", EMBEDDING_MODEL, EMBEDDING_BACKEND)
+            embedder = make_embedder(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+            embedder.load()
+            _embedder = embedder
     return _embedder
 
 
-def embed(texts: list[str]) -> list[list[float]]:
-    model = get_embedder()
-    return model.encode(texts, normalize_embeddings=True).tolist()
+def embedder_id() -> str:
+    """Identity of the vectors encode() produces; backends other than the reference drift slightly."""
+    if EMBEDDING_BACKEND == REFERENCE_BACKEND:
+        return EMBEDDING_MODEL
+    return f"{EMBEDDING_MODEL}@{EMBEDDING_BACKEND}"
+
+
+def embedder_stats() -> dict:
+    if _embedder is None:
+        return {"backend": EMBEDDING_BACKEND, "model": EMBEDDING_MODEL, "load_seconds": None}
+    return _embedder.stats()
+
+
+def parity_check() -> dict:
+    """Cosine drift of the active backend against the sentence-transformers reference (blocking)."""
+    from memory.embedders import parity_check as _parity_check
+    return _parity_check(get_embedder())
+
+
+def encode(texts: list[str]) -> list[list[float]]:
+    """Blocking encode — runs on the embedding service's thread pool."""
+    return get_embedder().encode(texts)
+
+
+async def embed(texts: list[str]) -> list[list[float]]:
+    from memory.embedding_cache import embedding_cache
+    from memory.embedding_service import embedding_service
+
+    vectors = await embedding_cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+    if missing:
+        fresh = dict(zip(missing, await embedding_service.embed(missing)))
+        await embedding_cache.put_many(fresh)
+        vectors = [v if v is not None else fresh[t] for t, v in zip(texts, vectors)]
+    return vectors  # type: ignore[return-value]
 
 
 def _score_result(metadata: dict) -> float:
@@ -57,43 +96,61 @@ async def retrieve(
     query_text: str,
     collections: Optional[list[str]] = None,
     n_per_collection: int = 5,
+    query_embedding: Optional[list[float]] = None,
 ) -> list[dict]:
     if collections is None:
         collections = ["conversation_history", "knowledge_base", "skill_memory"]
 
-    query_embedding = embed([query_text])[0]
+    if query_embedding is None:
+        with tracer.span("rag.embed"):
+            query_embedding = (await embed([query_text]))[0]
     candidates = []
 
-    for col_name in collections:
+    async def _query_one(col_name: str) -> list[dict]:
+        found = []
         try:
-            results = await query(
-                collection_name=col_name,
-                query_embeddings=[query_embedding],
-                n_results=n_per_collection,
-            )
+            with tracer.span("rag.query", collection=col_name):
+                results = await query(
+                    collection_name=col_name,
+                    query_embeddings=[query_embedding],
+                    n_results=n_per_collection,
+                )
+            ids = results.get("ids", [[]])[0]
             docs = results.get("documents", [[]])[0]
             metas = results.get("metadatas", [[]])[0]
             distances = results.get("distances", [[]])[0]
 
-            for doc, meta, dist in zip(docs, metas, distances):
-                similarity = 1.0 - dist  # cosine: distance → similarity
-                if similarity < SIMILARITY_THRESHOLD:
-                    continue
-                score = _score_result(meta)
-                candidates.append({
-                    "document": doc,
-                    "metadata": meta,
-                    "similarity": similarity,
-                    "score": score,
-                    "collection": col_name,
-                })
+            with tracer.span("rag.score", collection=col_name):
+                for doc_id, doc, meta, dist in zip(ids, docs, metas, distances):
+                    similarity = 1.0 - dist  # cosine: distance → similarity
+                    if similarity < SIMILARITY_THRESHOLD:
+                        continue
+                    score = _score_result(meta)
+                    found.append({
+                        "id": doc_id,
+                        "document": doc,
+                        "metadata": meta,
+                        "similarity": similarity,
+                        "score": score,
+                        "collection": col_name,
+                    })
         except Exception as exc:
             logger.warning("RAG retrieve error in %s: %s", col_name, exc)
+        return found
+
+    # Collections are independent — query them concurrently.
+    for found in await asyncio.gather(*(_query_one(name) for name in collections)):
+        candidates.extend(found)
 
     candidates.sort(key=lambda x: x["score"], reverse=True)
     return candidates[:CONTEXT_TOP_N]
 
 
+def context_sources(retrieved: list[dict]) -> list[str]:
+    """Stable identities of retrieved memories; unlike the rendered block they carry no scores."""
+    return [f"{item['collection']}/{item['id']}" for item in retrieved]
+
+
 def build_context_block(retrieved: list[dict]) -> str:
     if not retrieved:
         return ""
@@ -107,7 +164,29 @@ def build_context_block(retrieved: list[dict]) -> str:
     return "\n".join(parts)
 
 
-async def retrieve_and_format(query_text: str) -> str:
-    await enforce_vector_ceiling()
-    retrieved = await retrieve(query_text)
-    return build_context_block(retrieved)
+async def _traced_ceiling() -> None:
+    with tracer.span("rag.ceiling"):
+        await enforce_vector_ceiling()
+
+
+async def retrieve_for_prompt(
+    query_text: str,
+    query_embedding: Optional[list[float]] = None,
+    enforce_ceiling: bool = True,
+) -> list[dict]:
+    """Pass query_embedding to skip embedding; batch callers enforce the ceiling once themselves."""
+    if not enforce_ceiling:
+        return await retrieve(query_text, query_embedding=query_embedding)
+    # The ceiling sweep doesn't affect this query's results, so overlap it.
+    _, retrieved = await asyncio.gather(
+        _traced_ceiling(), retrieve(query_text, query_embedding=query_embedding)
+    )
+    return retrieved
+
+
+async def retrieve_and_format(
+    query_text: str,
+    query_embedding: Optional[list[float]] = None,
+    enforce_ceiling: bool = True,
+) -> str:
+    return build_context_block(await retrieve_for_prompt(query_text, query_embedding, enforce_ceiling))
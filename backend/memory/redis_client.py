@@ -12,6 +12,7 @@ logger = logging.getLogger(__name__)
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
 _pool: Optional[ConnectionPool] = None
+_scripts: dict[str, Any] = {}
 
 
 async def get_pool() -> ConnectionPool:
@@ -81,6 +82,45 @@ async def get_hash(name: str) -> dict:
     return result
 
 
+async def push_capped(key: str, value: Any, max_len: int, ttl: Optional[int] = None) -> None:
+    """LPUSH + LTRIM (+ EXPIRE) in one round trip — a capped, newest-first list."""
+    r = await get_client()
+    serialized = json.dumps(value) if not isinstance(value, str) else value
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.lpush(key, serialized)
+        pipe.ltrim(key, 0, max_len - 1)
+        if ttl:
+            pipe.expire(key, ttl)
+        await pipe.execute()
+
+
+async def get_list(key: str, start: int = 0, end: int = -1) -> list:
+    r = await get_client()
+    raw = await r.lrange(key, start, end)
+    result = []
+    for v in raw:
+        try:
+            result.append(json.loads(v))
+        except (json.JSONDecodeError, TypeError):
+            result.append(v)
+    return result
+
+
+async def get_script(source: str) -> Any:
+    """Registered Lua script; `await script(keys=..., args=..., client=pipe)` queues it on a pipeline."""
+    script = _scripts.get(source)
+    if script is None:
+        r = await get_client()
+        script = _scripts[source] = r.register_script(source)
+    return script
+
+
+async def run_script(source: str, keys: list[str], args: list[Any]) -> Any:
+    """Run a Lua script atomically (EVALSHA, loading it on first use)."""
+    script = await get_script(source)
+    return await script(keys=keys, args=args, client=await get_client())
+
+
 async def publish(channel: str, message: Any) -> None:
     r = await get_client()
     payload = json.dumps(message) if not isinstance(message, str) else message
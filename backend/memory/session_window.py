@@ -0,0 +1,55 @@
+"""Per-session recent-turn window — deterministic short-term context.
+
+The last SESSION_WINDOW_TURNS turns of each session are kept in a capped
+Redis list (newest first, TTL refreshed on every write). The orchestrator
+prepends them to the prompt with a single LRANGE — no embedding or ChromaDB
+call — leaving vector search for older memory.
+"""
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_WINDOW_TURNS = int(os.getenv("SESSION_WINDOW_TURNS", "6"))
+SESSION_WINDOW_TTL = int(os.getenv("SESSION_WINDOW_TTL", "3600"))
+SESSION_WINDOW_MAX_CHARS = int(os.getenv("SESSION_WINDOW_MAX_CHARS", "2000"))  # per message
+REDIS_KEY_PREFIX = "talos:session:recent:"
+
+
+def _truncate(text: str) -> str:
+    if len(text) <= SESSION_WINDOW_MAX_CHARS:
+        return text
+    return text[:SESSION_WINDOW_MAX_CHARS] + " […]"
+
+
+async def append_turn(session_id: str, user_input: str, response: str) -> None:
+    from memory.redis_client import push_capped
+    await push_capped(
+        REDIS_KEY_PREFIX + session_id,
+        {"user": _truncate(user_input), "assistant": _truncate(response), "ts": time.time()},
+        max_len=SESSION_WINDOW_TURNS,
+        ttl=SESSION_WINDOW_TTL,
+    )
+
+
+async def get_recent_turns(session_id: str) -> list[dict]:
+    """Return the session's recent turns, oldest first."""
+    from memory.redis_client import get_list
+    turns = await get_list(REDIS_KEY_PREFIX + session_id, 0, SESSION_WINDOW_TURNS - 1)
+    return [t for t in reversed(turns) if isinstance(t, dict)]
+
+
+def build_window_block(turns: list[dict]) -> str:
+    if not turns:
+        return ""
+    parts = ["[RECENT CONVERSATION]"]
+    for turn in turns:
+        parts.append(f"User: {turn.get('user', '')}")
+        parts.append(f"Assistant: {turn.get('assistant', '')}")
+    parts.append("[END RECENT CONVERSATION]")
+    return "\n".join(parts)
+
+
+async def get_window_block(session_id: str) -> str:
+    return build_window_block(await get_recent_turns(session_id))
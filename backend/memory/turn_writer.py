@@ -0,0 +1,166 @@
+"""Write-behind queue for conversation turn storage.
+
+The orchestrator enqueues each finished turn instead of writing it inline.
+A single background worker drains the queue in micro-batches: one embedding
+call and one ChromaDB add per batch.
+
+The queue is bounded. Producers wait up to TURN_ENQUEUE_TIMEOUT for space
+(backpressure); after that the turn is dropped and counted. Pending turns
+are flushed when the app shuts down.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from orchestrator.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+TURN_QUEUE_MAX = int(os.getenv("TURN_QUEUE_MAX", "1000"))
+TURN_BATCH_SIZE = int(os.getenv("TURN_BATCH_SIZE", "32"))
+TURN_BATCH_WAIT = float(os.getenv("TURN_BATCH_WAIT_MS", "200")) / 1000
+TURN_ENQUEUE_TIMEOUT = 2.0
+TURN_FLUSH_TIMEOUT = 30.0
+COLLECTION = "conversation_history"
+
+
+class TurnWriter:
+    def __init__(
+        self,
+        maxsize: int = TURN_QUEUE_MAX,
+        batch_size: int = TURN_BATCH_SIZE,
+        batch_wait: float = TURN_BATCH_WAIT,
+    ) -> None:
+        self._queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=maxsize)
+        self._batch_size = batch_size
+        self._batch_wait = batch_wait
+        self._running = False
+        self._task: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._running = True
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                "Turn writer started (queue=%d, batch=%d, wait=%dms)",
+                self._queue.maxsize, self._batch_size, int(self._batch_wait * 1000),
+            )
+
+    async def close(self, timeout: float = TURN_FLUSH_TIMEOUT) -> None:
+        """Stop the worker once everything still queued has been written."""
+        self._running = False
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            logger.error("Turn writer flush timed out — %d turns lost", self._queue.qsize())
+        logger.info("Turn writer stopped (written=%d dropped=%d failed=%d)",
+                    self.written, self.dropped, self.failed)
+
+    async def enqueue(
+        self,
+        session_id: str,
+        user_input: str,
+        response: str,
+        correlation_id: str,
+    ) -> bool:
+        """Queue a turn for storage. Returns False if it was dropped."""
+        item = {
+            "id": correlation_id,
+            "session_id": session_id,
+            "document": f"User: {user_input}\nAssistant: {response}",
+            "created_at": time.time(),
+        }
+        try:
+            await asyncio.wait_for(self._queue.put(item), timeout=TURN_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.dropped += 1
+            logger.warning("[%s] Turn queue full (%d) — dropping turn", correlation_id, self._queue.maxsize)
+            return False
+        self.enqueued += 1
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "queue_max": self._queue.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+        }
+
+    async def _run(self) -> None:
+        while self._running or not self._queue.empty():
+            batch = await self._next_batch()
+            if batch:
+                await self._write(batch)
+
+    async def _next_batch(self) -> list[dict]:
+        if not self._running:
+            # Shutting down: take whatever is queued without waiting.
+            batch = []
+            while len(batch) < self._batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            return batch
+
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout=0.5)
+        except asyncio.TimeoutError:
+            return []
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self._batch_wait
+        while len(batch) < self._batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _write(self, batch: list[dict]) -> None:
+        try:
+            from memory.rag import embed
+            from memory.chroma_client import add_documents
+
+            documents = [item["document"] for item in batch]
+            with tracer.span("store.embed", batch=len(batch)):
+                embeddings = await embed(documents)
+
+            with tracer.span("store.add", batch=len(batch)):
+                await add_documents(
+                    collection_name=COLLECTION,
+                    ids=[item["id"] for item in batch],
+                    documents=documents,
+                    embeddings=embeddings,
+                    metadatas=[{
+                        "session_id": item["session_id"],
+                        "created_at": item["created_at"],
+                        "last_access": item["created_at"],
+                        "access_count": 1,
+                        "priority": "normal",
+                    } for item in batch],
+                )
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as exc:
+            self.failed += len(batch)
+            logger.warning("Failed to store %d conversation turns: %s", len(batch), exc)
+
+
+# Module-level singleton
+turn_writer = TurnWriter()
@@ -0,0 +1,320 @@
+"""Asynchronous job queue for long-running chat requests.
+
+POST /jobs returns a job id immediately; a bounded pool of workers runs the
+message through process_message() and stores the result in Redis. Clients
+poll GET /jobs/{id} (optionally long-polling with ?wait=) or subscribe to
+the JOB_EVENTS_CHANNEL pub/sub channel.
+
+Job records live at talos:job:<id> with a TTL. Ids of jobs that have not
+finished are kept in the talos:jobs:unfinished set. Each queued or running
+job is leased by the process holding it (talos:job:lease:<id>, renewed every
+JOB_LEASE_TTL / 3 seconds); any worker process picks up unfinished jobs
+whose lease has lapsed, so jobs of a process that stopped or died are
+resumed elsewhere (up to JOB_MAX_ATTEMPTS runs each).
+
+A job ends as "done", "failed", or "blocked" when the firewall or lockdown
+rejected the message.
+"""
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "200"))
+JOB_TTL = int(os.getenv("JOB_TTL", "86400"))
+JOB_LEASE_TTL = int(os.getenv("JOB_LEASE_TTL", "60"))
+JOB_WAIT_POLL = float(os.getenv("JOB_WAIT_POLL", "0.5"))  # wait() re-reads jobs other processes run
+JOB_WORKER_ID = os.getenv("JOB_WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+JOB_MAX_ATTEMPTS = 3
+JOB_KEY_PREFIX = "talos:job:"
+JOB_LEASE_PREFIX = "talos:job:lease:"
+JOB_UNFINISHED_KEY = "talos:jobs:unfinished"
+JOB_EVENTS_CHANNEL = "talos:jobs:events"
+FINISHED_STATUSES = ("done", "failed", "blocked")
+
+# Leases are renewed and released only by their owner.
+_RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobManager:
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        maxsize: int = JOB_QUEUE_MAX,
+        owner: str = JOB_WORKER_ID,
+    ) -> None:
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+        self._reserved = 0  # queue slots claimed by submits still persisting their job
+        self._num_workers = workers
+        self._workers: list[asyncio.Task] = []
+        self._lease_task: Optional[asyncio.Task] = None
+        self._held: set[str] = set()  # jobs this process has leased (queued or running)
+        self._waiters: dict[str, asyncio.Event] = {}
+        self.owner = owner
+        self.completed = 0
+        self.failed = 0
+        self.blocked = 0
+
+    async def start(self) -> None:
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(n)) for n in range(self._num_workers)
+        ]
+        resumed = await self._resume_unfinished()
+        self._lease_task = asyncio.create_task(self._maintain_leases())
+        logger.info("Job workers started (workers=%d, resumed=%d)", self._num_workers, resumed)
+
+    async def stop(self) -> None:
+        # Queued/running jobs stay in the unfinished set; releasing their
+        # leases lets another process (or the next start) resume them.
+        tasks = self._workers + ([self._lease_task] if self._lease_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._lease_task = None
+        for job_id in list(self._held):
+            await self._release(job_id)
+
+    async def submit(self, request: dict) -> dict:
+        """Persist a new job and queue it. Raises JobQueueFull when at capacity."""
+        if not self._reserve():
+            raise JobQueueFull(f"Job queue full ({self._queue.maxsize})")
+        from memory.redis_client import get_client
+
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "status": "queued",
+            "created_at": time.time(),
+            "attempts": 0,
+            "owner": self.owner,
+            "request": request,
+            "result": None,
+        }
+        try:
+            await self._claim(job["job_id"])
+            await self._save(job)
+            r = await get_client()
+            await r.sadd(JOB_UNFINISHED_KEY, job["job_id"])
+            self._enqueue(job["job_id"])
+        except Exception:
+            await self._discard(job["job_id"])
+            raise
+        finally:
+            self._reserved -= 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        from memory.redis_client import get_value
+        return await get_value(JOB_KEY_PREFIX + job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[dict]:
+        """Return the job once finished, or its current state after timeout.
+
+        Jobs finished in this process wake the waiter at once; jobs run by
+        another process are noticed within JOB_WAIT_POLL seconds.
+        """
+        job = await self.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES or timeout <= 0:
+            return job
+        event = self._waiters.setdefault(job_id, asyncio.Event())
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                await asyncio.wait_for(event.wait(), timeout=min(remaining, JOB_WAIT_POLL))
+            except asyncio.TimeoutError:
+                pass
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES or remaining <= JOB_WAIT_POLL:
+                break
+        if job is None or job["status"] in FINISHED_STATUSES:
+            self._waiters.pop(job_id, None)
+        return job
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "workers": len(self._workers),
+            "leased": len(self._held),
+            "completed": self.completed,
+            "failed": self.failed,
+            "blocked": self.blocked,
+        }
+
+    def _reserve(self) -> bool:
+        """Claim a queue slot without awaiting, so concurrent submits cannot overfill the queue."""
+        if self._queue.maxsize and self._queue.qsize() + self._reserved >= self._queue.maxsize:
+            return False
+        self._reserved += 1
+        return True
+
+    def _enqueue(self, job_id: str) -> None:
+        self._held.add(job_id)
+        self._queue.put_nowait(job_id)
+
+    async def _claim(self, job_id: str) -> bool:
+        """Take the job's lease unless a live process holds it."""
+        from memory.redis_client import get_client
+        r = await get_client()
+        return bool(await r.set(JOB_LEASE_PREFIX + job_id, self.owner, nx=True, ex=JOB_LEASE_TTL))
+
+    async def _release(self, job_id: str) -> None:
+        from memory.redis_client import run_script
+        self._held.discard(job_id)
+        try:
+            await run_script(_RELEASE_LEASE_SCRIPT, [JOB_LEASE_PREFIX + job_id], [self.owner])
+        except Exception as exc:
+            logger.warning("Job lease release failed for %s: %s", job_id, exc)
+
+    async def _discard(self, job_id: str) -> None:
+        """Undo a submit that failed part-way."""
+        from memory.redis_client import delete_key, get_client
+        try:
+            r = await get_client()
+            await r.srem(JOB_UNFINISHED_KEY, job_id)
+            await delete_key(JOB_KEY_PREFIX + job_id)
+        except Exception as exc:
+            logger.warning("Job rollback failed for %s: %s", job_id, exc)
+        await self._release(job_id)
+
+    async def _maintain_leases(self) -> None:
+        """Renew this process's leases and adopt unfinished jobs whose lease lapsed."""
+        from memory.redis_client import run_script
+        while True:
+            await asyncio.sleep(JOB_LEASE_TTL / 3)
+            try:
+                for job_id in list(self._held):
+                    renewed = await run_script(
+                        _RENEW_LEASE_SCRIPT, [JOB_LEASE_PREFIX + job_id], [self.owner, JOB_LEASE_TTL]
+                    )
+                    if not renewed:
+                        logger.warning("Lost the lease on job %s", job_id)
+                        self._held.discard(job_id)
+                resumed = await self._resume_unfinished()
+                if resumed:
+                    logger.info("Adopted %d unfinished jobs with lapsed leases", resumed)
+            except Exception as exc:
+                logger.warning("Job lease maintenance failed: %s", exc)
+
+    async def _resume_unfinished(self) -> int:
+        from memory.redis_client import get_client
+        r = await get_client()
+        resumed = 0
+        for job_id in await r.smembers(JOB_UNFINISHED_KEY):
+            if job_id in self._held:
+                continue
+            job = await self.get(job_id)
+            if job is None or job["status"] in FINISHED_STATUSES:
+                await r.srem(JOB_UNFINISHED_KEY, job_id)  # record expired or finish interrupted
+                continue
+            if not self._reserve():
+                logger.warning("Job queue full — %s stays unfinished for now", job_id)
+                break
+            try:
+                if not await self._claim(job_id):
+                    continue  # queued or running in a live process
+                job["status"] = "queued"
+                job["owner"] = self.owner
+                await self._save(job)
+                self._enqueue(job_id)
+                resumed += 1
+            finally:
+                self._reserved -= 1
+        return resumed
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as exc:
+                logger.error("Job worker %d crashed on %s: %s", n, job_id, exc)
+            if job_id in self._held:
+                await self._release(job_id)  # unfinished: another process may retry it
+
+    async def _run(self, job_id: str) -> None:
+        from orchestrator.loop import process_message
+
+        if job_id not in self._held:
+            return  # lease lost while queued
+        job = await self.get(job_id)
+        if job is None:
+            return
+        if job["attempts"] >= JOB_MAX_ATTEMPTS:
+            await self._finish(job, "failed", {"error": f"gave up after {JOB_MAX_ATTEMPTS} attempts"})
+            return
+
+        job["status"] = "running"
+        job["attempts"] += 1
+        job["started_at"] = time.time()
+        await self._save(job)
+
+        try:
+            result = await process_message(**job["request"])
+        except Exception as exc:
+            logger.error("Job %s failed: %s", job_id, exc)
+            await self._finish(job, "failed", {"error": str(exc)})
+            return
+        if result.get("blocked"):
+            status = "blocked"
+        elif result.get("error"):
+            status = "failed"
+        else:
+            status = "done"
+        await self._finish(job, status, result)
+
+    async def _finish(self, job: dict, status: str, result: dict) -> None:
+        from memory.redis_client import get_client, publish
+
+        job["status"] = status
+        job["result"] = result
+        job["finished_at"] = time.time()
+        await self._save(job)
+        r = await get_client()
+        await r.srem(JOB_UNFINISHED_KEY, job["job_id"])
+        await self._release(job["job_id"])
+        if status == "done":
+            self.completed += 1
+        elif status == "blocked":
+            self.blocked += 1
+        else:
+            self.failed += 1
+
+        event = self._waiters.pop(job["job_id"], None)
+        if event is not None:
+            event.set()
+        try:
+            await publish(JOB_EVENTS_CHANNEL, {"job_id": job["job_id"], "status": status})
+        except Exception as exc:
+            logger.warning("Job event publish failed: %s", exc)
+
+    async def _save(self, job: dict) -> None:
+        from memory.redis_client import set_value
+        await set_value(JOB_KEY_PREFIX + job["job_id"], job, ttl=JOB_TTL)
+
+
+# Module-level singleton
+job_manager = JobManager()
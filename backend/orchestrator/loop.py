@@ -1,13 +1,24 @@
 """Central orchestrator loop.
 
 Message flow:
-  receive → firewall → RAG context inject → route to model → store response → return
+  receive → [firewall | lockdown | RAG context | recent turns] → route to model → store response → return
+
+The bracketed pre-generation stages run concurrently; if any gate blocks the
+message, in-flight context retrieval is cancelled.
+
+process_batch() handles many messages at once, grouped by target model.
+
+process_message_stream() runs the same pipeline but yields events as the
+model produces tokens, so callers can show output before generation ends.
 """
 import asyncio
 import logging
 import time
 import uuid
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Optional
+
+from orchestrator.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -17,19 +28,341 @@ async def process_message(
     session_id: Optional[str] = None,
     images: Optional[list[str]] = None,
     force_cloud: bool = False,
+    temperature: Optional[float] = None,
+    use_cache: bool = True,
 ) -> dict:
     """
     Full message processing pipeline. Returns a response dict.
     """
     correlation_id = str(uuid.uuid4())
+    has_session = bool(session_id)  # otherwise no later turn can read this one's session state
     session_id = session_id or correlation_id
+    kv_session = session_id if has_session else None  # Ollama context reuse (intelligence.kv_context)
+    start_time = time.time()
+
+    trace = tracer.start(correlation_id)
+    try:
+        logger.info("[%s] Processing message (len=%d)", correlation_id, len(user_input))
+
+        blocked, prompt, context, continuation = await _prepare_prompt(user_input, session_id, correlation_id)
+        if blocked:
+            return blocked
+
+        cached, semantic_key = await _semantic_lookup(
+            user_input, prompt, context, images, force_cloud, temperature, use_cache, correlation_id
+        )
+
+        # Step 5: Route to model
+        try:
+            from intelligence.router import route
+            if cached is not None:
+                response_text = cached
+                await _invalidate_kv_context(kv_session)
+            else:
+                served: list[str] = []
+                response_text = await route(
+                    prompt=prompt,
+                    images=images,
+                    force_cloud=force_cloud,
+                    use_cache=use_cache,
+                    session_id=kv_session,
+                    continuation=continuation,
+                    temperature=temperature,
+                    user_input=user_input,
+                    context_sources=[s for b in context for s in b.sources],
+                    served=served,
+                )
+                _semantic_store(semantic_key, response_text, served)
+        except Exception as exc:
+            logger.error("[%s] Model routing failed: %s", correlation_id, exc)
+            return {
+                "correlation_id": correlation_id,
+                "error": str(exc),
+                "response": None,
+            }
+
+        duration_ms = int((time.time() - start_time) * 1000)
+        tracer.record("total", duration_ms)
+        logger.info("[%s] Response generated in %dms", correlation_id, duration_ms)
+
+        # Step 6: Queue conversation turn for vector memory (written in batches)
+        await _store_turn(session_id, user_input, response_text, correlation_id, has_session)
+
+        return {
+            "correlation_id": correlation_id,
+            "session_id": session_id,
+            "response": response_text,
+            "duration_ms": duration_ms,
+            "blocked": False,
+        }
+    finally:
+        tracer.finish(trace)
+
+
+async def process_message_stream(
+    user_input: str,
+    session_id: Optional[str] = None,
+    images: Optional[list[str]] = None,
+    force_cloud: bool = False,
+    temperature: Optional[float] = None,
+    use_cache: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Streaming variant of process_message(). Yields event dicts:
+
+      {"type": "blocked", ...}   pre-generation checks rejected the message (final)
+      {"type": "start", ...}     checks passed, generation is starting
+      {"type": "token", "text"}  one chunk of model output
+      {"type": "done", ...}      generation finished, turn queued for storage
+      {"type": "error", ...}     routing failed mid-stream (final)
+    """
+    correlation_id = str(uuid.uuid4())
+    has_session = bool(session_id)  # otherwise no later turn can read this one's session state
+    session_id = session_id or correlation_id
+    kv_session = session_id if has_session else None  # Ollama context reuse (intelligence.kv_context)
+    start_time = time.time()
+
+    trace = tracer.start(correlation_id)
+    try:
+        logger.info("[%s] Processing streamed message (len=%d)", correlation_id, len(user_input))
+
+        blocked, prompt, context, continuation = await _prepare_prompt(user_input, session_id, correlation_id)
+        if blocked:
+            yield {"type": "blocked", **blocked}
+            return
+
+        yield {"type": "start", "correlation_id": correlation_id, "session_id": session_id}
+
+        cached, semantic_key = await _semantic_lookup(
+            user_input, prompt, context, images, force_cloud, temperature, use_cache, correlation_id
+        )
+
+        from intelligence.router import route_stream
+        parts: list[str] = []
+        served: list[str] = []
+        first_token_ms: Optional[int] = None
+        try:
+            if cached is not None:
+                await _invalidate_kv_context(kv_session)
+            tokens = _single(cached) if cached is not None else route_stream(
+                prompt=prompt,
+                images=images,
+                force_cloud=force_cloud,
+                use_cache=use_cache,
+                session_id=kv_session,
+                continuation=continuation,
+                temperature=temperature,
+                served=served,
+            )
+            async for token in tokens:
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - start_time) * 1000)
+                parts.append(token)
+                yield {"type": "token", "text": token}
+        except Exception as exc:
+            logger.error("[%s] Model routing failed: %s", correlation_id, exc)
+            yield {"type": "error", "correlation_id": correlation_id, "error": str(exc)}
+            return
+
+        if cached is None:
+            _semantic_store(semantic_key, "".join(parts), served)
+
+        duration_ms = int((time.time() - start_time) * 1000)
+        tracer.record("total", duration_ms)
+        if first_token_ms is not None:
+            tracer.record("first_token", first_token_ms)
+        logger.info(
+            "[%s] Streamed response in %dms (first token %sms)",
+            correlation_id, duration_ms, first_token_ms,
+        )
+
+        await _store_turn(session_id, user_input, "".join(parts), correlation_id, has_session)
+
+        yield {
+            "type": "done",
+            "correlation_id": correlation_id,
+            "session_id": session_id,
+            "duration_ms": duration_ms,
+            "first_token_ms": first_token_ms,
+        }
+    finally:
+        tracer.finish(trace)
+
+
+async def process_batch(
+    items: list[dict],
+    temperature: Optional[float] = None,
+    use_cache: bool = True,
+) -> list[dict]:
+    """
+    Process many messages in one pass. Each item is a dict with "message" and
+    optional "session_id", "images", "force_cloud".
+
+    All messages that pass the gates are embedded in a single call, then
+    grouped by target model; groups for already-loaded models run
+    first and each group runs while its model stays resident, minimising
+    VRAM swaps. Returns one result dict per item, in input order, each with
+    a "status" of "ok", "blocked" or "error".
+    """
+    from intelligence.router import route_group, select_tier
+    from intelligence.ollama_pool import ollama_pool
+    from memory.chroma_client import enforce_vector_ceiling
+    from memory.rag import embed, retrieve_and_format
+    from memory.session_window import get_window_block
+
     start_time = time.time()
+    results: list[Optional[dict]] = [None] * len(items)
+    entries: list[dict] = []
 
-    logger.info("[%s] Processing message (len=%d)", correlation_id, len(user_input))
+    for index, item in enumerate(items):
+        correlation_id = str(uuid.uuid4())
+        session_id = item.get("session_id") or correlation_id
+        user_input = item["message"]
+        blocked = await _gate_firewall(user_input, session_id, correlation_id)
+        if blocked:
+            results[index] = {"index": index, "status": "blocked", **blocked}
+            continue
+        entries.append({
+            "index": index,
+            "correlation_id": correlation_id,
+            "session_id": session_id,
+            "has_session": bool(item.get("session_id")),
+            "user_input": user_input,
+            "images": item.get("images"),
+            "force_cloud": bool(item.get("force_cloud")),
+        })
+
+    if entries:
+        lockdown = await _gate_lockdown("", "", "batch")
+        if lockdown:
+            for e in entries:
+                results[e["index"]] = {
+                    "index": e["index"], "status": "blocked", **lockdown,
+                    "correlation_id": e["correlation_id"],
+                }
+            entries = []
+
+    logger.info("Batch: %d items, %d passed gates", len(items), len(entries))
+
+    if entries:
+        # One embedding call for the whole batch, one ceiling sweep.
+        try:
+            with tracer.span("rag.embed", batch=len(entries)):
+                vectors = await embed([e["user_input"] for e in entries])
+            await enforce_vector_ceiling()
+            rag_blocks = await asyncio.gather(*(
+                retrieve_and_format(e["user_input"], query_embedding=v, enforce_ceiling=False)
+                for e, v in zip(entries, vectors)
+            ), return_exceptions=True)
+        except Exception as exc:
+            logger.warning("Batch RAG retrieval failed (continuing without context): %s", exc)
+            rag_blocks = [""] * len(entries)
+        window_blocks = await asyncio.gather(
+            *(get_window_block(e["session_id"]) for e in entries), return_exceptions=True
+        )
+
+        groups: dict[str, list[dict]] = {}
+        for e, rag_block, window_block in zip(entries, rag_blocks, window_blocks):
+            parts = [b for b in (rag_block, window_block) if isinstance(b, str) and b]
+            e["prompt"] = "\n\n".join(parts + [e["user_input"]])
+            e["tier"] = select_tier(e["prompt"], e["images"], e["force_cloud"])
+            groups.setdefault(e["tier"], []).append(e)
+
+        loaded = {m.mutex.loaded_model for m in ollama_pool.members}
+        order = sorted(groups, key=lambda tier: (tier not in loaded, tier == "cloud", tier))
+        for tier in order:
+            group = groups[tier]
+            logger.info("Batch: running %d items on %s", len(group), tier)
+            responses = await route_group(
+                tier,
+                [e["prompt"] for e in group],
+                images=[e["images"] for e in group],
+                use_cache=use_cache,
+                temperature=temperature,
+            )
+            for e, result in zip(group, responses):
+                base = {
+                    "index": e["index"],
+                    "correlation_id": e["correlation_id"],
+                    "session_id": e["session_id"],
+                }
+                if isinstance(result, Exception):
+                    logger.error("[%s] Batch item failed: %s", e["correlation_id"], result)
+                    results[e["index"]] = {**base, "status": "error", "error": str(result), "response": None}
+                    continue
+                response, served = result
+                results[e["index"]] = {**base, "status": "ok", "response": response, "model": served}
+                if e["has_session"]:
+                    await _invalidate_kv_context(e["session_id"])
+                await _store_turn(
+                    e["session_id"], e["user_input"], response, e["correlation_id"], e["has_session"]
+                )
 
-    # Step 1: Firewall check
-    from skills.firewall import scan, ThreatLevel
-    fw_result = scan(user_input)
+    logger.info("Batch of %d finished in %dms", len(items), int((time.time() - start_time) * 1000))
+    return results  # type: ignore[return-value]
+
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _semantic_lookup(
+    user_input: str,
+    prompt: str,
+    context: list["ContextBlock"],
+    images: Optional[list[str]],
+    force_cloud: bool,
+    temperature: Optional[float],
+    use_cache: bool,
+    correlation_id: str,
+) -> tuple[Optional[str], Optional[tuple]]:
+    """
+    Consult the opt-in semantic cache. Returns (cached_response, store_key);
+    store_key is passed to _semantic_store() after a fresh generation.
+    Requests the exact-match cache would not replay (response_cache.replayable)
+    bypass it too.
+    """
+    from intelligence.response_cache import replayable
+    from intelligence.semantic_cache import semantic_cache
+    if not semantic_cache.enabled or not use_cache or images or not replayable(temperature):
+        return None, None
+    try:
+        from intelligence.router import select_tier, model_name_for_tier
+        tier = select_tier(prompt, images, force_cloud)
+        model = model_name_for_tier(tier)
+        fingerprint = semantic_cache.fingerprint(model, None, [s for b in context for s in b.sources])
+        query_vector = next((b.query_vector for b in context if b.query_vector is not None), None)
+        with tracer.span("semantic_cache"):
+            cached, vector = await semantic_cache.lookup(user_input, fingerprint, query_vector)
+    except Exception as exc:
+        logger.warning("[%s] Semantic cache lookup failed: %s", correlation_id, exc)
+        return None, None
+    if cached is not None:
+        logger.info("[%s] Served from semantic cache", correlation_id)
+    return cached, (vector, fingerprint, tier)
+
+
+def _semantic_store(key: Optional[tuple], response: str, served: list[str]) -> None:
+    """Store under the looked-up model only if that model's tier produced the response."""
+    if key is None:
+        return
+    from intelligence.semantic_cache import semantic_cache
+    vector, fingerprint, tier = key
+    if served != [tier]:
+        return
+    semantic_cache.store(vector, fingerprint, response)
+
+
+async def _invalidate_kv_context(session_id: str) -> None:
+    """A turn answered outside route()/route_stream() leaves the session's Ollama context stale."""
+    from intelligence.kv_context import kv_context
+    await kv_context.invalidate(session_id)
+
+
+async def _gate_firewall(user_input: str, session_id: str, correlation_id: str) -> Optional[dict]:
+    from skills.firewall import scan
+    with tracer.span("firewall"):
+        fw_result = scan(user_input)
     if not fw_result.allowed:
         logger.warning("[%s] Message blocked by firewall: %s", correlation_id, fw_result.detections)
         return {
@@ -39,10 +372,13 @@ async def process_message(
             "detections": fw_result.detections,
             "response": None,
         }
+    return None
+
 
-    # Step 2: Check lockdown state
+async def _gate_lockdown(user_input: str, session_id: str, correlation_id: str) -> Optional[dict]:
     from memory.redis_client import get_value
-    lockdown = await get_value("talos:security:lockdown")
+    with tracer.span("lockdown"):
+        lockdown = await get_value("talos:security:lockdown")
     if lockdown and lockdown.get("active"):
         return {
             "correlation_id": correlation_id,
@@ -50,51 +386,106 @@ async def process_message(
             "reason": "system_lockdown",
             "response": "System is in lockdown mode. Please provide unlock code to administrator.",
         }
+    return None
+
 
-    # Step 3: Retrieve RAG context
+@dataclass
+class ContextBlock:
+    """A context provider's output: the text prepended to the prompt and what it was built from.
+
+    sources are stable ids (memory ids, session ids) used to fingerprint the
+    context for the semantic cache and singleflight; query_vector is the
+    embedding of the user input, when the provider computed one.
+    session_history is set by _prepare_prompt for SESSION_HISTORY_PROVIDERS.
+    """
+    text: str
+    sources: list[str] = field(default_factory=list)
+    query_vector: Optional[list[float]] = None
+    session_history: bool = False
+
+
+async def _context_recent_turns(user_input: str, session_id: str, correlation_id: str) -> ContextBlock:
+    from memory.session_window import get_window_block
+    with tracer.span("session_window"):
+        block = await get_window_block(session_id)
+    return ContextBlock(block, [f"session:{session_id}"] if block else [])
+
+
+async def _context_rag(user_input: str, session_id: str, correlation_id: str) -> ContextBlock:
+    # The query embedding is awaited from memory.embedding_service, which
+    # encodes on a worker thread, so this task yields to the gates at once
+    # instead of holding the event loop for the encode.
+    from memory.rag import build_context_block, context_sources, embed, retrieve_for_prompt
+    vector: Optional[list[float]] = None
     try:
-        from memory.rag import retrieve_and_format
-        context_block = await retrieve_and_format(user_input)
+        with tracer.span("rag.embed"):
+            vector = (await embed([user_input]))[0]
+        retrieved = await retrieve_for_prompt(user_input, query_embedding=vector)
     except Exception as exc:
         logger.warning("[%s] RAG retrieval failed (continuing without context): %s", correlation_id, exc)
-        context_block = ""
+        return ContextBlock("", query_vector=vector)
+    return ContextBlock(build_context_block(retrieved), context_sources(retrieved), vector)
 
-    # Step 4: Build prompt with context
-    prompt = user_input
-    if context_block:
-        prompt = f"{context_block}\n\n{user_input}"
 
-    # Step 5: Route to model
+# Pre-generation stages, all started concurrently for every message.
+# Gates return a blocked-result dict to reject the message (or None to pass);
+# context providers return a ContextBlock whose text is prepended to the prompt,
+# in list order (long-term memory first, so the most recent turns sit next to
+# the question).
+PRE_GENERATION_GATES = [_gate_firewall, _gate_lockdown]
+CONTEXT_PROVIDERS = [_context_rag, _context_recent_turns]
+# Providers whose blocks a reused Ollama session context already holds
+# (intelligence.kv_context); they are left out of the continuation prompt.
+SESSION_HISTORY_PROVIDERS = {_context_recent_turns}
+
+
+async def _prepare_prompt(
+    user_input: str,
+    session_id: str,
+    correlation_id: str,
+) -> tuple[Optional[dict], str, list[ContextBlock], str]:
+    """
+    Run the pre-generation stages concurrently.
+    Returns (blocked_result, prompt, context, continuation); blocked_result is
+    None when the message may proceed, context is the ContextBlocks whose text
+    precedes user_input, and continuation is the prompt without the
+    SESSION_HISTORY_PROVIDERS blocks.
+    Context work still in flight when a gate blocks is cancelled.
+    """
+    context_tasks = [
+        asyncio.create_task(provider(user_input, session_id, correlation_id))
+        for provider in CONTEXT_PROVIDERS
+    ]
+    gate_tasks = [
+        asyncio.create_task(gate(user_input, session_id, correlation_id))
+        for gate in PRE_GENERATION_GATES
+    ]
     try:
-        from intelligence.router import route
-        response_text = await route(
-            prompt=prompt,
-            images=images,
-            force_cloud=force_cloud,
-        )
-    except Exception as exc:
-        logger.error("[%s] Model routing failed: %s", correlation_id, exc)
-        return {
-            "correlation_id": correlation_id,
-            "error": str(exc),
-            "response": None,
-        }
+        for next_gate in asyncio.as_completed(gate_tasks):
+            blocked = await next_gate
+            if blocked:
+                return blocked, user_input, [], user_input
 
-    duration_ms = int((time.time() - start_time) * 1000)
-    logger.info("[%s] Response generated in %dms", correlation_id, duration_ms)
+        blocks = await asyncio.gather(*context_tasks, return_exceptions=True)
+    finally:
+        for task in context_tasks + gate_tasks:
+            if not task.done():
+                task.cancel()
 
-    # Step 6: Store conversation turn in vector memory
-    asyncio.create_task(
-        _store_turn(session_id, user_input, response_text, correlation_id)
-    )
+    context: list[ContextBlock] = []
+    continuation_parts = []
+    for provider, block in zip(CONTEXT_PROVIDERS, blocks):
+        if isinstance(block, BaseException):
+            logger.warning("[%s] Context provider %s failed: %s", correlation_id, provider.__name__, block)
+            continue
+        block.session_history = provider in SESSION_HISTORY_PROVIDERS
+        context.append(block)
+        if block.text and not block.session_history:
+            continuation_parts.append(block.text)
 
-    return {
-        "correlation_id": correlation_id,
-        "session_id": session_id,
-        "response": response_text,
-        "duration_ms": duration_ms,
-        "blocked": False,
-    }
+    prompt = "\n\n".join([b.text for b in context if b.text] + [user_input])
+    continuation = "\n\n".join(continuation_parts + [user_input])
+    return None, prompt, context, continuation
 
 
 async def _store_turn(
@@ -102,29 +493,21 @@ async def _store_turn(
     user_input: str,
     response: str,
     correlation_id: str,
+    has_session: bool = True,
 ) -> None:
-    """Store conversation turn into ChromaDB for future RAG retrieval."""
-    try:
-        import time as _time
-        from memory.rag import embed
-        from memory.chroma_client import add_documents
-
-        doc = f"User: {user_input}\nAssistant: {response}"
-        embedding = embed([doc])[0]
-        now = _time.time()
-
-        await add_documents(
-            collection_name="conversation_history",
-            ids=[correlation_id],
-            documents=[doc],
-            embeddings=[embedding],
-            metadatas=[{
-                "session_id": session_id,
-                "created_at": now,
-                "last_access": now,
-                "access_count": 1,
-                "priority": "normal",
-            }],
-        )
-    except Exception as exc:
-        logger.warning("Failed to store conversation turn: %s", exc)
+    """
+    Record the turn in the session's recent-turn window (read by the next
+    message) and queue it for batched storage into ChromaDB (see memory.turn_writer).
+    Without a caller-supplied session there is no next message to read the
+    window, so only the ChromaDB write happens.
+    """
+    from memory.session_window import append_turn
+    from memory.turn_writer import turn_writer
+    if has_session:
+        try:
+            with tracer.span("session_window.append"):
+                await append_turn(session_id, user_input, response)
+        except Exception as exc:
+            logger.warning("[%s] Failed to update session window: %s", correlation_id, exc)
+    with tracer.span("store.enqueue"):
+        await turn_writer.enqueue(session_id, user_input, response, correlation_id)
@@ -0,0 +1,155 @@
+"""Per-stage latency tracing for the orchestrator pipeline.
+
+Each message gets a Trace keyed on its correlation_id. Code anywhere on the
+request path records spans with `tracer.span("stage")`; the active trace is
+carried in a contextvar, so spans recorded inside tasks spawned by the
+pipeline land on the right trace without passing ids around.
+
+Every span also feeds a rolling per-stage window used for p50/p95/p99 in
+GET /metrics. Recent traces can be dumped to Tier-3 as JSON-L; each dump
+appends the traces finished since the previous one. Traces still running
+are held back until their message is done, so no later span is lost.
+"""
+import contextvars
+import json
+import logging
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+LOG_DIR = Path(os.getenv("TALOS_LOG_DIR", "/talos/logs"))
+TRACE_DUMP_FILE = LOG_DIR / "tier3" / "traces.jsonl"
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "500"))         # traces kept for dumping
+LATENCY_WINDOW = int(os.getenv("TRACE_LATENCY_WINDOW", "1000"))  # samples per stage
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar(
+    "talos_trace", default=None
+)
+
+
+class Trace:
+    """Spans recorded for one message, in start order."""
+
+    def __init__(self, correlation_id: str) -> None:
+        self.correlation_id = correlation_id
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: list[dict] = []
+        self.finished = False
+        self.dumped = False
+
+    def to_dict(self) -> dict:
+        return {
+            "correlation_id": self.correlation_id,
+            "started_at": self.started_at,
+            "spans": sorted(self.spans, key=lambda s: s["start_ms"]),
+        }
+
+
+class Tracer:
+    def __init__(self, history: int = TRACE_HISTORY, window: int = LATENCY_WINDOW) -> None:
+        self._recent: deque[Trace] = deque(maxlen=history)
+        self._window = window
+        self._samples: dict[str, deque[float]] = {}
+
+    def start(self, correlation_id: str) -> Trace:
+        """Begin a trace and make it current for this task and its children."""
+        trace = Trace(correlation_id)
+        _current_trace.set(trace)
+        self._recent.append(trace)
+        return trace
+
+    @staticmethod
+    def finish(trace: Trace) -> None:
+        """Mark a trace complete; dump_jsonl() writes only finished traces."""
+        trace.finished = True
+
+    @staticmethod
+    def current() -> Optional[Trace]:
+        return _current_trace.get()
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[dict]:
+        """Time a stage. Yields the span's attr dict so callers can annotate it."""
+        trace = _current_trace.get()
+        start = time.perf_counter()
+        error: Optional[str] = None
+        try:
+            yield attrs
+        except BaseException as exc:
+            error = type(exc).__name__
+            raise
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.record(name, duration_ms)
+            if trace is not None:
+                span = {
+                    "name": name,
+                    "start_ms": round((start - trace._t0) * 1000, 2),
+                    "duration_ms": round(duration_ms, 2),
+                }
+                if attrs:
+                    span["attrs"] = attrs
+                if error:
+                    span["error"] = error
+                trace.spans.append(span)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples[name] = deque(maxlen=self._window)
+        samples.append(duration_ms)
+
+    def percentile(self, name: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Rolling percentile for one stage, or None with fewer than min_samples."""
+        samples = self._samples.get(name)
+        if not samples or len(samples) < min_samples:
+            return None
+        return _percentile(sorted(samples), q)
+
+    def histograms(self) -> dict:
+        """Rolling latency percentiles per stage, in milliseconds."""
+        out = {}
+        for name, samples in sorted(self._samples.items()):
+            ordered = sorted(samples)
+            out[name] = {
+                "count": len(ordered),
+                "p50": round(_percentile(ordered, 0.50), 1),
+                "p95": round(_percentile(ordered, 0.95), 1),
+                "p99": round(_percentile(ordered, 0.99), 1),
+            }
+        return out
+
+    def recent(self, limit: Optional[int] = None) -> list[dict]:
+        traces = list(self._recent)
+        if limit is not None:
+            traces = traces[-limit:]
+        return [t.to_dict() for t in traces]
+
+    def dump_jsonl(self, path: Optional[Path] = None) -> int:
+        """Append finished traces not dumped before to a JSON-L file. Returns the number written."""
+        target = Path(path) if path else TRACE_DUMP_FILE
+        target.parent.mkdir(parents=True, exist_ok=True)
+        traces = [t for t in list(self._recent) if t.finished and not t.dumped]
+        with target.open("a") as f:
+            for trace in traces:
+                f.write(json.dumps(trace.to_dict()) + "\n")
+                trace.dumped = True
+        logger.info("Dumped %d traces to %s", len(traces), target)
+        return len(traces)
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+# Module-level singleton
+tracer = Tracer()
@@ -0,0 +1,87 @@
+"""Single-flight coalescing must not hand one session's answer to another."""
+import asyncio
+
+from intelligence import router
+from memory import session_window
+from orchestrator import loop
+
+
+class _Turn:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.context = None
+
+    async def commit(self):
+        pass
+
+
+def _pipeline(monkeypatch, windows):
+    """Stub every stage around route()'s singleflight; return the prompts that were generated."""
+    generated = []
+
+    async def no_rag(user_input, session_id, correlation_id):
+        return loop.ContextBlock("")
+
+    async def window_block(session_id):
+        return windows.get(session_id, "")
+
+    async def begin_turn(session_id, tier, images):
+        return _Turn(session_id)
+
+    async def no_cache(*args):
+        return None, None
+
+    async def no_semantic_cache(*args):
+        return None, None
+
+    async def generate(tier, prompt, *args):
+        generated.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"answer to: {prompt}", tier
+
+    async def no_store(*args):
+        pass
+
+    monkeypatch.setattr(loop, "PRE_GENERATION_GATES", [])
+    monkeypatch.setattr(loop, "CONTEXT_PROVIDERS", [no_rag, loop._context_recent_turns])
+    monkeypatch.setattr(session_window, "get_window_block", window_block)
+    monkeypatch.setattr(loop, "_semantic_lookup", no_semantic_cache)
+    monkeypatch.setattr(loop, "_store_turn", no_store)
+    monkeypatch.setattr(router, "model_name_for_tier", lambda tier: tier)
+    monkeypatch.setattr(router, "_begin_turn", begin_turn)
+    monkeypatch.setattr(router, "_cache_lookup", no_cache)
+    monkeypatch.setattr(router, "_route_uncached", generate)
+    return generated
+
+
+def test_sessions_with_different_windows_do_not_coalesce(monkeypatch):
+    windows = {
+        "x": "[RECENT CONVERSATION]\nUser: what is 2+2?",
+        "y": "[RECENT CONVERSATION]\nUser: name a colour",
+    }
+    generated = _pipeline(monkeypatch, windows)
+
+    async def scenario():
+        return await asyncio.gather(
+            loop.process_message("what did I just ask you?", session_id="x"),
+            loop.process_message("what did I just ask you?", session_id="y"),
+        )
+
+    x, y = asyncio.run(scenario())
+    assert len(generated) == 2
+    assert "2+2" in x["response"] and "colour" not in x["response"]
+    assert "colour" in y["response"] and "2+2" not in y["response"]
+
+
+def test_requests_without_session_text_still_coalesce(monkeypatch):
+    generated = _pipeline(monkeypatch, {})
+
+    async def scenario():
+        return await asyncio.gather(
+            loop.process_message("what is the capital of France?"),
+            loop.process_message("what is the capital of France?"),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert len(generated) == 1
+    assert first["response"] == second["response"]
@@ -0,0 +1,35 @@
+"""Request-path failures: only connection-level errors take a host down."""
+import asyncio
+
+import httpx
+
+from intelligence.endpoint_monitor import EndpointMonitor
+from intelligence.ollama_client import parse_hosts
+
+
+def _monitor():
+    host = parse_hosts("http://127.0.0.1:1")[0]
+    return EndpointMonitor(hosts=[host]), f"ollama@{host.name}"
+
+
+def test_timeout_leaves_host_and_its_other_requests_alone():
+    async def scenario():
+        monitor, name = _monitor()
+
+        async def healthy() -> str:
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        other = asyncio.ensure_future(monitor.run_unless_down(name, healthy()))
+        await asyncio.sleep(0)
+        monitor.report_failure(name, httpx.ReadTimeout("generation took too long"))
+        assert await other == "ok"
+        assert monitor.is_available("ollama")
+
+    asyncio.run(scenario())
+
+
+def test_connect_error_marks_host_down():
+    monitor, name = _monitor()
+    monitor.report_failure(name, httpx.ConnectError("connection refused"))
+    assert not monitor.is_available("ollama")
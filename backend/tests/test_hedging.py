@@ -0,0 +1,62 @@
+"""Hedged requests: the losing local leg must stop generating on the Ollama side."""
+import asyncio
+import select
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from intelligence.endpoint_monitor import EndpointMonitor
+from intelligence.hedging import Hedger
+from intelligence.ollama_client import generate, parse_hosts
+
+
+class _SlowGenerate(BaseHTTPRequestHandler):
+    """Never answers /api/generate; flags the server once the client hangs up."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            readable, _, _ = select.select([self.connection], [], [], 0.05)
+            if readable and not self.connection.recv(1, socket.MSG_PEEK):
+                self.server.disconnected.set()
+                return
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cancelled_local_leg_closes_the_ollama_request():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowGenerate)
+    server.disconnected = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    async def scenario():
+        host = parse_hosts(f"http://127.0.0.1:{server.server_address[1]}")[0]
+        monitor = EndpointMonitor(hosts=[host])
+        # What router._call_local hands the hedger.
+        local = monitor.run_unless_down(f"ollama@{host.name}", generate("coder", "hi", host=host))
+
+        async def cloud() -> str:
+            await asyncio.sleep(0.05)
+            return "cloud"
+
+        hedger = Hedger()
+        hedger.delay_ms = lambda stage: 100.0
+
+        async def admit(prompt, system):
+            return 100
+
+        hedger._admit = admit
+        assert await hedger.call(local, cloud, "hi", None) == "cloud"
+        # Checked before teardown, which would close the connection anyway.
+        disconnected = await asyncio.to_thread(server.disconnected.wait, 2)
+        await host.http().aclose()
+        assert disconnected, "local leg kept its HTTP request open"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,104 @@
+"""OllamaPool selection against stub Ollama HTTP servers."""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from intelligence.endpoint_monitor import EndpointMonitor
+from intelligence.ollama_client import parse_hosts
+from intelligence.ollama_pool import OllamaPool
+
+
+class _StubOllama(BaseHTTPRequestHandler):
+    """Answers the endpoints the pool and VRAM mutex touch."""
+
+    def do_GET(self):
+        self._reply({"models": []})  # /api/tags, /api/ps
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._reply({"response": "", "done": True})  # /api/generate (warm/unload)
+
+    def _reply(self, body: dict) -> None:
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def stub_servers(count: int):
+    servers = [ThreadingHTTPServer(("127.0.0.1", 0), _StubOllama) for _ in range(count)]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield servers
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
+
+
+def _pool(servers) -> tuple[OllamaPool, EndpointMonitor]:
+    hosts = parse_hosts(",".join(f"http://127.0.0.1:{s.server_address[1]}" for s in servers))
+    monitor = EndpointMonitor(hosts=hosts)
+    return OllamaPool(hosts, monitor=monitor), monitor
+
+
+async def _warm(pool: OllamaPool, model_type: str) -> None:
+    for member in pool.members:
+        async with member.mutex.acquire(model_type):
+            pass
+
+
+def test_parse_hosts():
+    hosts = parse_hosts(" http://gpu-a:11434/ ,, http://gpu-b:11434")
+    assert [h.name for h in hosts] == ["gpu-a:11434", "gpu-b:11434"]
+    assert hosts[0].base_url == "http://gpu-a:11434"
+
+
+def test_selects_least_loaded_host_with_model_resident():
+    async def scenario():
+        with stub_servers(2) as servers:
+            pool, _ = _pool(servers)
+            a, b = pool.members
+            await _warm(pool, "coder")
+            assert a.has_resident("coder") and b.has_resident("coder")
+
+            async with a.mutex.acquire("coder"):
+                assert pool.select("coder") is b
+            async with b.mutex.acquire("coder"):
+                assert pool.select("coder") is a
+
+    asyncio.run(scenario())
+
+
+def test_fails_over_when_host_goes_down():
+    async def scenario():
+        with stub_servers(2) as servers:
+            pool, monitor = _pool(servers)
+            a, b = pool.members
+            await _warm(pool, "coder")
+
+            servers[1].shutdown()
+            servers[1].server_close()
+            try:
+                await b.host.http().get("/api/tags")
+            except httpx.TransportError as exc:
+                monitor.report_failure(b.service, exc)
+            assert not monitor.is_available(b.service)
+
+            # a is busier, but b is down.
+            async with a.mutex.acquire("coder"):
+                assert pool.healthy() == [a]
+                assert pool.select("coder") is a
+
+    asyncio.run(scenario())